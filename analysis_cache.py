@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+
+import hashlib
+import inspect
+import os
+import sys
+from enum import Enum
+
+import pandas as pd
+
+from ingest_sessions import find_session_files
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel
+
+"""
+Incremental analysis of the session files with a cache:
+    python3 analysis_cache.py <session directory> <cache directory> <output directory>
+
+The notebook parses all session files and computes the derived tables (pointing_technique_table, filtered_data,
+correct_clicks, normal/novel_pointing_technique_table) again for every run. With AnalysisCache, the result of every
+step is stored in the cache directory under a key made of
+    - the name of the step,
+    - the code version of the step, i.e. a hash of the source code of the function of the step, of the values of
+      the module constants it uses (e.g. FILTERED_COLUMNS) and of the class constants of the classes it uses
+      (e.g. PointingExperimentModel.IS_TARGET) and
+    - the SHA-256 hash of the content of its input (a session file or the keys of the results it combines).
+So only new or changed session files are parsed and filtered again, and the combined tables are only computed again
+if one of their parts has changed. If the code of a step or one of its constants changes, its cached results are not
+used anymore.
+
+The cache entries are pickled DataFrames. After every new entry the least recently used entries are removed
+until the cache is smaller than the size budget.
+"""
+
+CACHE_FILE_EXTENSION = ".pkl"
+DEFAULT_SIZE_BUDGET = 512 * 1024 * 1024  # bytes
+
+NOVEL_POINTER = "novel"
+NORMAL_POINTER = "normal"
+
+FILTERED_COLUMNS = [ConfigKeys.PARTICIPANT_ID.value, PointingExperimentModel.CONDITION, ConfigKeys.POINTER_TYPE.value,
+                    PointingExperimentModel.DISTANCE_TO_START_POSITION, PointingExperimentModel.CIRCLE_CLICKED,
+                    PointingExperimentModel.IS_TARGET, PointingExperimentModel.TASK_COMPLETION_TIME]
+CORRECT_CLICK_COLUMNS = [ConfigKeys.PARTICIPANT_ID.value, PointingExperimentModel.CONDITION,
+                         ConfigKeys.POINTER_TYPE.value, PointingExperimentModel.DISTANCE_TO_START_POSITION,
+                         PointingExperimentModel.TASK_COMPLETION_TIME]
+
+
+def hash_file(file_name):
+    file_hash = hashlib.sha256()
+
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+
+def hash_strings(strings):
+    return hashlib.sha256("\n".join(strings).encode("utf-8")).hexdigest()
+
+
+def get_global_names(code):
+    # also the names used by nested functions and lambdas
+    names = set(code.co_names)
+
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= get_global_names(constant)
+
+    return names
+
+
+def is_constant(value):
+    return isinstance(value, (str, int, float, list, tuple, dict, Enum))
+
+
+def get_code_version(function):
+    code_version = hashlib.sha256(inspect.getsource(function).encode("utf-8"))
+
+    for name in sorted(get_global_names(function.__code__)):
+        value = function.__globals__.get(name)
+        if is_constant(value):
+            code_version.update("{0}={1!r}".format(name, value).encode("utf-8"))
+        elif inspect.isclass(value):
+            # e.g. the column names of PointingExperimentModel, the constants of the base classes are left out
+            for attribute, attribute_value in sorted(vars(value).items()):
+                if not attribute.startswith("_") and is_constant(attribute_value):
+                    code_version.update("{0}.{1}={2!r}".format(name, attribute, attribute_value).encode("utf-8"))
+
+    return code_version.hexdigest()[:16]
+
+
+class AnalysisCache:
+
+    def __init__(self, directory, size_budget=DEFAULT_SIZE_BUDGET):
+        self.__directory = directory
+        self.__size_budget = size_budget
+        self.hit_count = 0
+        self.miss_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def __get_file_name(self, key):
+        return os.path.join(self.__directory, key + CACHE_FILE_EXTENSION)
+
+    def get_key(self, step, input_hash):
+        return "{0}-{1}-{2}".format(step.__name__, get_code_version(step), input_hash[:32])
+
+    def compute(self, step, input_hash, *arguments):
+        """Returns the cache key and the result of step(*arguments), which is only computed if it is not cached."""
+        key = self.get_key(step, input_hash)
+        file_name = self.__get_file_name(key)
+
+        if os.path.isfile(file_name):
+            # the modification time is used to find the least recently used entries
+            os.utime(file_name)
+            self.hit_count += 1
+            return key, pd.read_pickle(file_name)
+
+        self.miss_count += 1
+        result = step(*arguments)
+
+        temporary_file_name = file_name + ".tmp"
+        result.to_pickle(temporary_file_name)
+        os.replace(temporary_file_name, file_name)
+        self.evict()
+
+        return key, result
+
+    def evict(self):
+        entries = []
+
+        for file_name in os.listdir(self.__directory):
+            if file_name.endswith(CACHE_FILE_EXTENSION):
+                stat = os.stat(os.path.join(self.__directory, file_name))
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, file_name in sorted(entries):
+            if total_size <= self.__size_budget:
+                break
+
+            os.remove(os.path.join(self.__directory, file_name))
+            total_size -= size
+
+
+# steps of the analysis, they are the same as in pointing_technique_experiment.ipynb
+def parse_session(file_name):
+    return pd.read_csv(file_name)
+
+
+def filter_session(session):
+    return session[FILTERED_COLUMNS]
+
+
+def select_correct_clicks(filtered_session):
+    return filtered_session[filtered_session[PointingExperimentModel.IS_TARGET]][CORRECT_CLICK_COLUMNS]
+
+
+def combine(*tables):
+    return pd.concat(tables, ignore_index=True)
+
+
+def select_pointer(table, pointer_type):
+    return table[table[ConfigKeys.POINTER_TYPE.value] == pointer_type]
+
+
+def compute_combined(cache, step_keys, tables):
+    # the combined table only changes if one of the cached parts has changed
+    return cache.compute(combine, hash_strings(step_keys), *tables)[1]
+
+
+def run_analysis(session_directory, cache):
+    """Returns the derived tables of all session files in the session directory by their file names."""
+    session_keys, sessions = [], []
+    filtered_keys, filtered_sessions = [], []
+    correct_click_keys, correct_clicks = [], []
+
+    for file_name in find_session_files(session_directory):
+        key, session = cache.compute(parse_session, hash_file(file_name), file_name)
+        session_keys.append(key)
+        sessions.append(session)
+
+        key, filtered_session = cache.compute(filter_session, hash_strings([key]), session)
+        filtered_keys.append(key)
+        filtered_sessions.append(filtered_session)
+
+        key, correct_click_table = cache.compute(select_correct_clicks, hash_strings([key]), filtered_session)
+        correct_click_keys.append(key)
+        correct_clicks.append(correct_click_table)
+
+    pointing_technique_table = compute_combined(cache, session_keys, sessions)
+
+    return {
+        "pointing_technique_table.csv": pointing_technique_table,
+        "normal_pointing_technique_table.csv": select_pointer(pointing_technique_table, NORMAL_POINTER),
+        "novel_pointing_technique_table.csv": select_pointer(pointing_technique_table, NOVEL_POINTER),
+        "filtered_data.csv": compute_combined(cache, filtered_keys, filtered_sessions),
+        "correct_clicks.csv": compute_combined(cache, correct_click_keys, correct_clicks)
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        sys.stderr.write("usage: analysis_cache.py <session directory> <cache directory> <output directory>\n")
+        sys.exit(1)
+
+    analysis_cache = AnalysisCache(sys.argv[2])
+    derived_tables = run_analysis(sys.argv[1], analysis_cache)
+
+    os.makedirs(sys.argv[3], exist_ok=True)
+    for table_file_name, table in derived_tables.items():
+        table.to_csv(os.path.join(sys.argv[3], table_file_name), index=False)
+
+    sys.stderr.write("{0} cached results used, {1} computed\n".format(analysis_cache.hit_count,
+                                                                     analysis_cache.miss_count))
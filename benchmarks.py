@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+
+import json
+import os
+import statistics
+import sys
+import time
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from circle_layout import CircleLayout
+from input_clock import InputClock
+from pointing_experiment import MainWindow
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel
+from pointing_technique import PointingTechnique
+from simulated_participant import SimulatedClock
+from virtual_pointer_device import VirtualPointerDevice, FakeUInput
+
+"""
+Benchmarks of the hot paths of the experiment, run on the offscreen Qt platform:
+    python3 benchmarks.py [baseline.json] > results.json
+
+    - layout: creation of the distractor layout for different circle counts and sizes
+    - trial_setup, trial_clear: setting up and clearing the circles of a trial, for both renderers
+    - flicker_tick: one tick of the distraction timer with 50 ms (circle flicker) and 100 ms (background flicker)
+    - csv_rows, csv_rows_total: writing result rows through the PointingExperimentModel, per row on the calling
+      thread and in total until all of them are written
+    - technique_filter: PointingTechnique.filter per mouse move, outside and inside of the threshold
+    - mouse_move: one mouse move event of a 1000 Hz mouse, handled by the window with the novel pointer
+
+The results are written to stdout as JSON, one object per benchmark and parameter set with the times in µs.
+If the results of an earlier run are given as baseline, every benchmark whose median is more than
+REGRESSION_FACTOR times slower than in the baseline is reported on stderr and the exit code is 1.
+"""
+
+REGRESSION_FACTOR = 1.25
+OUTPUT_FILE = os.devnull
+
+
+def create_config(circle_count, circle_size, distraction="none", renderer="widget", trial_count=5):
+    return {
+        ConfigKeys.PARTICIPANT_ID.value: 1,
+        ConfigKeys.POINTER_TYPE.value: "normal",
+        ConfigKeys.THRESHOLD.value: 0.33,
+        ConfigKeys.DENSITY.value: 20,
+        ConfigKeys.COLOR_BACKGROUND.value: "Orange",
+        ConfigKeys.COLOR_CIRCLES.value: "Black",
+        ConfigKeys.COLOR_TARGET.value: "Red",
+        ConfigKeys.CONDITIONS.value: [{
+            "id": 1,
+            ConfigKeys.CIRCLE_SIZE.value: circle_size,
+            ConfigKeys.CIRCLE_COUNT.value: circle_count,
+            ConfigKeys.DISTRACTION.value: distraction
+        }],
+        ConfigKeys.TARGET_POSITIONS.value: [[175, 469]] * trial_count,
+        ConfigKeys.RENDERER.value: renderer,
+        ConfigKeys.LAYOUT_SEED.value: 0,
+        ConfigKeys.RESULT_SINK.value: "file",
+        ConfigKeys.RESULT_FILE.value: OUTPUT_FILE
+    }
+
+
+def measure(function, iterations, setup=None):
+    # returns the duration of every call of function in µs
+    durations = []
+
+    for i in range(iterations):
+        if setup:
+            setup()
+
+        start = time.perf_counter_ns()
+        function()
+        durations.append((time.perf_counter_ns() - start) / 1000)
+
+    return durations
+
+
+def create_result(benchmark, parameters, durations):
+    durations = sorted(durations)
+
+    return {
+        "benchmark": benchmark,
+        "parameters": parameters,
+        "iterations": len(durations),
+        "min_us": durations[0],
+        "median_us": statistics.median(durations),
+        "mean_us": statistics.fmean(durations),
+        "p95_us": durations[int(0.95 * (len(durations) - 1))]
+    }
+
+
+def benchmark_layout():
+    for circle_size in [10, 25, 50, 100]:
+        layout = CircleLayout(PointingExperimentModel.WINDOW_WIDTH, PointingExperimentModel.WINDOW_HEIGHT, 0)
+
+        for circle_count in [20, 75, 500, 1000, 5000]:
+            if circle_count - 1 > layout.get_capacity(circle_size, (175, 469)):
+                continue
+
+            durations = measure(lambda: layout.create_positions(circle_count - 1, circle_size, (175, 469)), 50)
+            yield create_result("layout", {"circle_count": circle_count, "circle_size": circle_size}, durations)
+
+
+def benchmark_trial_transition():
+    for renderer in [PointingExperimentModel.RENDERER_WIDGET, PointingExperimentModel.RENDERER_CANVAS]:
+        for circle_count, circle_size in [(20, 100), (75, 50), (500, 25), (1000, 15)]:
+            iterations = 20
+            window = MainWindow(create_config(circle_count, circle_size, renderer=renderer,
+                                              trial_count=iterations + 1), headless=True)
+            window.show()
+
+            setup_durations = []
+            clear_durations = []
+            for i in range(iterations):
+                setup_durations += measure(window.setup_trial, 1)
+                clear_durations += measure(window.clear_trial, 1)
+
+            window.close()
+
+            parameters = {"renderer": renderer, "circle_count": circle_count, "circle_size": circle_size}
+            yield create_result("trial_setup", parameters, setup_durations)
+            yield create_result("trial_clear", parameters, clear_durations)
+
+
+def benchmark_flicker_tick():
+    for distraction, interval in [("circle_flicker", 50), ("background_flicker", 100)]:
+        for circle_count, circle_size in [(20, 100), (75, 50), (1000, 15)]:
+            # the ticks are called directly instead of by the timer, one frame interval later each
+            clock = SimulatedClock()
+            window = MainWindow(create_config(circle_count, circle_size, distraction),
+                                input_clock=InputClock(clock.now), headless=True)
+            window.show()
+            window.setup_trial()
+
+            distraction_engine = window.get_distraction_engine()
+            durations = measure(distraction_engine.tick, 200, lambda: clock.advance(interval))
+            window.close()
+
+            yield create_result("flicker_tick", {"interval_ms": interval, "circle_count": circle_count}, durations)
+
+
+def benchmark_csv_rows():
+    row_count = 10000
+    model = PointingExperimentModel(create_config(20, 100))
+    model.set_mouse_start_position(QtCore.QPoint(25, 575))
+    position = QtCore.QPoint(100, 100)
+
+    def write_rows():
+        for i in range(row_count):
+            model.handle_circle_clicked(position, False)
+
+    durations = measure(write_rows, 1)
+    close_durations = measure(model.close, 1)
+
+    # time per row on the calling thread and time until all rows are written
+    yield create_result("csv_rows", {"rows": row_count}, [durations[0] / row_count])
+    yield create_result("csv_rows_total", {"rows": row_count}, [durations[0] + close_durations[0]])
+
+
+def benchmark_technique_filter():
+    parent = QtWidgets.QWidget()
+    parent.resize(PointingExperimentModel.WINDOW_WIDTH, PointingExperimentModel.WINDOW_HEIGHT)
+    target = QtWidgets.QWidget(parent)
+    target.setGeometry(400, 300, 50, 50)
+
+    technique = PointingTechnique(target, 0.33, 20, VirtualPointerDevice(FakeUInput))
+    outside_position = QtCore.QPoint(0, 0)
+
+    def reset_technique():
+        # stops a running movement and leaves the threshold area, so the next filter call can start a new one
+        technique.cancel()
+        technique.filter(outside_position)
+
+    for name, position in [("outside_threshold", outside_position), ("inside_threshold", QtCore.QPoint(350, 300))]:
+        def filter_position():
+            technique.filter(position)
+
+        yield create_result("technique_filter", {"position": name}, measure(filter_position, 2000, reset_technique))
+
+
+def benchmark_mouse_move():
+    for renderer in [PointingExperimentModel.RENDERER_WIDGET, PointingExperimentModel.RENDERER_CANVAS]:
+        clock = SimulatedClock()
+        config = create_config(75, 50, renderer=renderer)
+        config[ConfigKeys.POINTER_TYPE.value] = "novel"
+
+        window = MainWindow(config, pointer_device=VirtualPointerDevice(FakeUInput),
+                            input_clock=InputClock(clock.now), headless=True)
+        window.show()
+        window.setup_trial()
+
+        # the moves are delivered to the widget under the cursor, like by the window system
+        events = []
+        for i in range(1000):
+            position = QtCore.QPoint(100 + i % 400, 100 + (i // 2) % 300)
+            widget = window.childAt(position) or window
+            events.append((widget, QtGui.QMouseEvent(QtCore.QEvent.MouseMove, widget.mapFrom(window, position),
+                                                     QtCore.Qt.NoButton, QtCore.Qt.NoButton, QtCore.Qt.NoModifier)))
+        events_iterator = iter(events)
+
+        def move_mouse():
+            QtWidgets.QApplication.sendEvent(*next(events_iterator))
+
+        durations = measure(move_mouse, len(events), lambda: clock.advance(1))
+        window.close()
+
+        yield create_result("mouse_move", {"renderer": renderer, "rate_hz": 1000}, durations)
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    baseline_medians = {(result["benchmark"], json.dumps(result["parameters"], sort_keys=True)): result["median_us"]
+                        for result in baseline}
+
+    for result in results:
+        key = (result["benchmark"], json.dumps(result["parameters"], sort_keys=True))
+
+        if key in baseline_medians and result["median_us"] > baseline_medians[key] * REGRESSION_FACTOR:
+            regressions.append("{0} {1}: {2:.1f} µs instead of {3:.1f} µs".format(
+                key[0], key[1], result["median_us"], baseline_medians[key]))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication(sys.argv)
+
+    benchmark_results = []
+    for benchmark in [benchmark_layout, benchmark_trial_transition, benchmark_flicker_tick, benchmark_csv_rows,
+                      benchmark_technique_filter, benchmark_mouse_move]:
+        benchmark_results += list(benchmark())
+
+    json.dump(benchmark_results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as baseline_file:
+            found_regressions = find_regressions(benchmark_results, json.load(baseline_file))
+
+        for regression in found_regressions:
+            sys.stderr.write("regression: {0}\n".format(regression))
+
+        if found_regressions:
+            sys.exit(1)
@@ -0,0 +1,155 @@
+from math import dist
+
+from PyQt5 import QtGui, QtWidgets, QtCore
+from PyQt5.QtCore import pyqtSignal
+
+"""
+Alternative renderer for the pointing experiment.
+Instead of creating one CircleWidget (a full QWidget) per circle, all circles of a trial are stored as lightweight
+CircleItem objects in one CircleCanvas. The canvas paints every circle in a single paintEvent, grouped by color so the
+painter state is only changed once per color, and only the dirty region of a changed circle is scheduled for repainting.
+
+A CircleItem offers the same methods as a CircleWidget that are used by the MainWindow and the PointingTechnique
+(set_color, set_target_color, set_diameter, set_target, is_target, move, geometry, width, parent, show),
+so both renderers can be selected in the config file ("renderer": "widget" or "canvas") and compared with each other.
+
+Clicks on a circle are emitted by the canvas together with the clicked item and the timestamp of the event.
+Clicks on the background are ignored by the canvas, so they are propagated to the parent window like before.
+"""
+
+
+class CircleItem:
+
+    def __init__(self, canvas):
+        self.__canvas = canvas
+        self.__geometry = QtCore.QRect(0, 0, 50, 50)
+        self.__radius = 25
+        self.__is_target = False
+        self.__target_color = QtGui.QColor("Red")
+        self.__color = QtGui.QColor("Black")
+        self.__visible = False
+
+    def __update(self):
+        if self.__visible:
+            self.__canvas.update(self.__geometry)
+
+    def set_color(self, color):
+        if self.__color == color:
+            return
+
+        self.__color = color
+        self.__update()
+
+    def set_target_color(self, target_color):
+        if self.__target_color == target_color:
+            return
+
+        self.__target_color = target_color
+        self.__update()
+
+    def get_paint_color(self):
+        if self.__is_target:
+            return self.__target_color
+
+        return self.__color
+
+    def set_diameter(self, diameter):
+        self.__update()
+        self.__radius = int(diameter / 2)
+        self.__geometry.setSize(QtCore.QSize(diameter, diameter))
+        self.__update()
+
+    def set_target(self, is_target):
+        self.__is_target = is_target
+        self.__update()
+
+    def is_target(self):
+        return self.__is_target
+
+    def is_visible(self):
+        return self.__visible
+
+    def contains(self, pos):
+        center = self.__geometry.topLeft() + QtCore.QPoint(self.__radius, self.__radius)
+        return dist([center.x(), center.y()], [pos.x(), pos.y()]) <= self.__radius
+
+    def move(self, x, y):
+        self.__update()
+        self.__geometry.moveTo(x, y)
+        self.__update()
+
+    def geometry(self):
+        return QtCore.QRect(self.__geometry)
+
+    def width(self):
+        return self.__geometry.width()
+
+    def parent(self):
+        return self.__canvas
+
+    def show(self):
+        self.__visible = True
+        self.__update()
+
+    def hide(self):
+        self.__update()
+        self.__visible = False
+
+
+class CircleCanvas(QtWidgets.QWidget):
+    clicked = pyqtSignal([QtCore.QPoint, object, object])
+
+    def __init__(self, parent=None):
+        super(CircleCanvas, self).__init__(parent)
+
+        self.setAttribute(QtCore.Qt.WA_StaticContents)
+        # like the CircleWidgets, the canvas covers the window, so the mouse moves only reach the window (e.g. the
+        # pointing technique) if the canvas tracks the mouse and passes the moves on
+        self.setMouseTracking(True)
+        self.__items = []
+
+    def create_item(self):
+        item = CircleItem(self)
+        self.__items.append(item)
+
+        return item
+
+    def remove_item(self, item):
+        item.hide()
+        self.__items.remove(item)
+
+    def paintEvent(self, event):
+        # group the visible circles in the dirty region by color to set the painter state only once per color
+        circles_by_color = {}
+        dirty_rect = event.rect()
+
+        for item in self.__items:
+            if item.is_visible() and item.geometry().intersects(dirty_rect):
+                color = item.get_paint_color()
+                circles_by_color.setdefault(color.rgba(), (color, []))[1].append(item.geometry())
+
+        if not circles_by_color:
+            return
+
+        painter = QtGui.QPainter()
+        painter.begin(self)
+
+        for color, rects in circles_by_color.values():
+            painter.setPen(color)
+            painter.setBrush(color)
+
+            for rect in rects:
+                painter.drawEllipse(rect.x(), rect.y(), rect.width() - 1, rect.height() - 1)
+
+        painter.end()
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            # the last created item is painted on top, therefore it is checked first
+            for item in reversed(self.__items):
+                if item.is_visible() and item.contains(event.pos()):
+                    self.clicked.emit(event.globalPos(), item, event.timestamp())
+                    return
+
+        # background clicks are handled by the parent window
+        event.ignore()
@@ -0,0 +1,72 @@
+import random
+
+"""
+Layout generator for the distractor circles.
+The previous implementation placed every circle at a random position and tried again as long as it collided with one
+of the circles placed so far. This needs quadratic time and never terminates if the window is (nearly) full.
+
+Instead, the window is divided into a uniform grid whose cells are at least as large as a circle. Every cell holds
+at most one circle, which is placed at a random position inside of its cell (jittered grid sampling), so circles can
+never overlap and no collision check is necessary. Cells which overlap the target are left out.
+Therefore the maximum number of circles is known in advance (see get_capacity) and the layout is created in linear
+time. The random generator can be seeded to reproduce the same layouts.
+"""
+
+
+class CircleLayout:
+
+    @staticmethod
+    def __get_cell_borders(length, diameter):
+        cell_count = max(length // diameter, 0)
+
+        # integer borders, every cell is at least diameter wide
+        return [(i * length) // cell_count for i in range(cell_count + 1)] if cell_count else [0]
+
+    @staticmethod
+    def __intersects(start, end, other_start, other_end):
+        return start < other_end and other_start < end
+
+    def __init__(self, width, height, seed=None):
+        self.__width = width
+        self.__height = height
+        self.__random = random.Random(seed)
+
+    def __get_free_cells(self, diameter, target_pos):
+        x_borders = self.__get_cell_borders(self.__width, diameter)
+        y_borders = self.__get_cell_borders(self.__height, diameter)
+        free_cells = []
+
+        for row in range(len(y_borders) - 1):
+            top, bottom = y_borders[row], y_borders[row + 1]
+
+            for column in range(len(x_borders) - 1):
+                left, right = x_borders[column], x_borders[column + 1]
+
+                if target_pos is not None \
+                        and self.__intersects(left, right, target_pos[0], target_pos[0] + diameter) \
+                        and self.__intersects(top, bottom, target_pos[1], target_pos[1] + diameter):
+                    continue
+
+                free_cells.append((left, top, right, bottom))
+
+        return free_cells
+
+    def get_capacity(self, diameter, target_pos=None):
+        """Returns the maximum number of circles which can be placed next to the target."""
+        return len(self.__get_free_cells(diameter, target_pos))
+
+    def create_positions(self, count, diameter, target_pos=None):
+        """Returns the top left positions of count non-overlapping circles which do not overlap the target."""
+        free_cells = self.__get_free_cells(diameter, target_pos)
+
+        if count > len(free_cells):
+            raise ValueError("{0} circles with a diameter of {1} do not fit, the maximum is {2}".format(
+                count, diameter, len(free_cells)))
+
+        positions = []
+        for (left, top, right, bottom) in self.__random.sample(free_cells, count):
+            x = self.__random.randint(left, right - diameter)
+            y = self.__random.randint(top, bottom - diameter)
+            positions.append((x, y))
+
+        return positions
@@ -0,0 +1,57 @@
+"""
+Pool of the circles of the pointing experiment (CircleWidgets or CircleItems, see circle_canvas.py).
+
+Instead of deleting all circles after a trial and creating and connecting new ones for the next trial, the circles
+are only hidden by release and reused by acquire, so a new layout only needs to move, resize and recolor them.
+If a trial needs more circles than the pool has, new circles are created with create_circle. Circles that were not
+needed for trim_delay acquisitions in a row are destroyed with destroy_circle, so the pool shrinks again when the
+circle count falls, but not when conditions with different circle counts alternate.
+"""
+
+
+class CirclePool:
+
+    def __init__(self, create_circle, destroy_circle, trim_delay=10):
+        self.__create_circle = create_circle
+        self.__destroy_circle = destroy_circle
+        self.__trim_delay = trim_delay
+
+        self.__circles = []
+        self.__used_count = 0
+        # for every circle the number of acquisitions in a row in which it was not used
+        self.__unused_counts = []
+
+    def __trim(self):
+        count = len(self.__circles)
+
+        while count > self.__used_count and self.__unused_counts[count - 1] >= self.__trim_delay:
+            count -= 1
+
+        for circle in self.__circles[count:]:
+            self.__destroy_circle(circle)
+
+        del self.__circles[count:]
+        del self.__unused_counts[count:]
+
+    def acquire(self, count):
+        """Returns count hidden circles, the circles of the last acquisition have to be released before."""
+        while len(self.__circles) < count:
+            self.__circles.append(self.__create_circle())
+            self.__unused_counts.append(0)
+
+        self.__used_count = count
+        for i in range(len(self.__circles)):
+            self.__unused_counts[i] = 0 if i < count else self.__unused_counts[i] + 1
+
+        self.__trim()
+
+        return self.__circles[:count]
+
+    def release(self):
+        for circle in self.__circles[:self.__used_count]:
+            circle.hide()
+
+        self.__used_count = 0
+
+    def get_size(self):
+        return len(self.__circles)
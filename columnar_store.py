@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+
+import json
+import os
+import sys
+
+import numpy as np
+
+"""
+Typed columnar storage for the results of the experiment:
+    python3 columnar_store.py <columnar directory> <output.csv>   exports a columnar directory as CSV file
+
+A columnar directory contains a file schema.json with the names, types and the number of rows, and one file per column
+(<column>.bin) with the raw values of this column. Every column has a fixed numpy dtype (bool, int64, float64,
+datetime64[us] or a UTF-8 string of at most STR_LENGTH bytes), so the values do not have to be parsed again and a
+column can be read without copying it via numpy.memmap (see load_columns) or loaded as pandas DataFrame (see
+load_dataframe).
+
+Rows are appended to the column files, and the row count in schema.json is only updated after the column files have
+been flushed, so a crashed session can still be read up to the last flush.
+"""
+
+SCHEMA_FILE = "schema.json"
+COLUMN_FILE_EXTENSION = ".bin"
+
+# maximum length of the values of str columns in bytes, longer values are rejected instead of being truncated
+STR_LENGTH = 32
+
+# column type names (see PointingExperimentModel.COLUMN_TYPES) and their numpy dtypes
+DTYPES = {
+    "bool": "|b1",
+    "int": "<i8",
+    "float": "<f8",
+    "datetime": "<M8[us]",
+    "str": "|S{0}".format(STR_LENGTH)
+}
+
+
+def get_column_file_name(directory, column):
+    return os.path.join(directory, column + COLUMN_FILE_EXTENSION)
+
+
+def read_schema(directory):
+    with open(os.path.join(directory, SCHEMA_FILE)) as file:
+        return json.load(file)
+
+
+def load_columns(directory):
+    """Returns a dict with a read-only numpy.memmap for every column."""
+    schema = read_schema(directory)
+    row_count = schema["row_count"]
+    columns = {}
+
+    for column in schema["columns"]:
+        dtype = np.dtype(DTYPES[column["type"]])
+
+        if row_count == 0:
+            columns[column["name"]] = np.empty(0, dtype=dtype)
+        else:
+            columns[column["name"]] = np.memmap(get_column_file_name(directory, column["name"]), dtype=dtype,
+                                                mode="r", shape=(row_count,))
+
+    return columns
+
+
+def load_dataframe(directory):
+    import pandas as pd
+
+    schema = read_schema(directory)
+    columns = load_columns(directory)
+
+    for column in schema["columns"]:
+        if column["type"] == "str":
+            columns[column["name"]] = np.char.decode(columns[column["name"]], "utf-8")
+
+    return pd.DataFrame(columns, copy=False)
+
+
+class ColumnarWriter:
+
+    @staticmethod
+    def __to_array(values, column_type):
+        if column_type == "str":
+            encoded = np.char.encode(np.asarray(values).astype(str), "utf-8")
+            if encoded.dtype.itemsize > STR_LENGTH:
+                too_long = encoded[np.char.str_len(encoded) > STR_LENGTH]
+                if len(too_long):
+                    raise ValueError("{0} is longer than {1} bytes".format(too_long[0].decode(), STR_LENGTH))
+
+            return encoded.astype(DTYPES[column_type])
+
+        # also converts strings like "NaN" to float
+        return np.asarray(values, dtype=DTYPES[column_type])
+
+    def __init__(self, directory, column_types, append=False):
+        # column_types is a list of (column name, column type name) pairs,
+        # with append the rows are appended to an existing columnar directory instead of replacing it
+        self.__directory = directory
+        self.__column_types = list(column_types)
+        self.__row_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        if append and os.path.exists(os.path.join(directory, SCHEMA_FILE)):
+            schema = read_schema(directory)
+            if [(column["name"], column["type"]) for column in schema["columns"]] != self.__column_types:
+                raise ValueError("the columns of {0} do not match the column types".format(directory))
+
+            self.__files = [open(get_column_file_name(directory, name), "ab") for name, _ in self.__column_types]
+            # removes the values after the last flush, e.g. of a crashed writer
+            self.truncate(schema["row_count"])
+        else:
+            self.__files = [open(get_column_file_name(directory, name), "wb") for name, _ in self.__column_types]
+
+        self.__write_schema()
+
+    def __write_schema(self):
+        schema = {
+            "columns": [{"name": name, "type": column_type} for name, column_type in self.__column_types],
+            "row_count": self.__row_count
+        }
+
+        # replaced at once, so the schema file is always complete
+        temporary_file_name = os.path.join(self.__directory, SCHEMA_FILE + ".tmp")
+        with open(temporary_file_name, "w") as file:
+            json.dump(schema, file)
+        os.replace(temporary_file_name, os.path.join(self.__directory, SCHEMA_FILE))
+
+    def get_row_count(self):
+        return self.__row_count
+
+    def truncate(self, row_count):
+        """Removes all rows after the first row_count rows, e.g. the rows of a file that could not be read
+        completely."""
+        for file, (_, column_type) in zip(self.__files, self.__column_types):
+            file.flush()
+            file.truncate(row_count * np.dtype(DTYPES[column_type]).itemsize)
+            file.seek(0, os.SEEK_END)
+
+        self.__row_count = row_count
+
+    def get_column_names(self):
+        return [name for name, _ in self.__column_types]
+
+    def write_rows(self, rows):
+        if rows:
+            self.write_columns([list(values) for values in zip(*rows)])
+
+    def write_columns(self, columns):
+        """Appends one array (or list) of values per column, in the order of the column types."""
+        row_count = None
+
+        # all values are converted first, so no column is written if a value is invalid
+        arrays = [self.__to_array(values, column_type)
+                  for values, (_, column_type) in zip(columns, self.__column_types)]
+
+        for file, array in zip(self.__files, arrays):
+            file.write(array.tobytes())
+            row_count = len(array)
+
+        self.__row_count += row_count or 0
+
+    def flush(self, durable=False):
+        for file in self.__files:
+            file.flush()
+
+            if durable:
+                os.fsync(file.fileno())
+
+        self.__write_schema()
+
+    def close(self):
+        self.flush()
+
+        for file in self.__files:
+            file.close()
+
+
+class ColumnarSink:
+    """Sink for the ResultWriter (see result_writer.py) which writes the rows to a columnar directory."""
+
+    def __init__(self, directory, column_types):
+        self.__writer = ColumnarWriter(directory, column_types)
+
+    def write_header(self, columns):
+        if list(columns) != self.__writer.get_column_names():
+            raise ValueError("the columns do not match the column types of the columnar directory")
+
+    def write_rows(self, rows):
+        self.__writer.write_rows(rows)
+
+    def flush(self, durable=False):
+        self.__writer.flush(durable)
+
+    def close(self):
+        self.__writer.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.stderr.write("usage: columnar_store.py <columnar directory> <output csv file>\n")
+        sys.exit(1)
+
+    load_dataframe(sys.argv[1]).to_csv(sys.argv[2], index=False, na_rep="NaN")
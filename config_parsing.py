@@ -1,4 +1,3 @@
-import ast
 import configparser
 import json
 import os
@@ -10,38 +9,180 @@ from pointing_experiment_model import ConfigKeys
 # Author: Claudia
 # Author of all test_config files: Claudia
 class ConfigParsing:
+    # key of the sessions in a study plan file (see study_plan.py), the sessions are stored by their session id
+    STUDY_PLAN_SESSIONS = "sessions"
+
+    POINTER_TYPES = ["normal", "novel"]
+    CONDITION_KEYS = ["id", ConfigKeys.CIRCLE_SIZE.value, ConfigKeys.CIRCLE_COUNT.value, ConfigKeys.DISTRACTION.value]
+
+    # file next to a study plan which records the version of the study plan that was validated, see load_study_plan
+    STUDY_PLAN_STAMP_EXTENSION = ".validated"
+
     @staticmethod
     def __exit_program(message="Please give a valid .ini or .json file as argument (-_-)\n"):
         sys.stderr.write(message)
         sys.exit(1)
 
-    def __init__(self):
+    @staticmethod
+    def validate(config):
+        """Returns a list of problems with the config, the list is empty if it is valid."""
+        problems = []
+
+        for key in ConfigKeys.get_all_values():
+            # sub elements of config file and optional keys are not checked here
+            if key not in config \
+                    and key != ConfigKeys.CIRCLE_SIZE.value \
+                    and key != ConfigKeys.CIRCLE_COUNT.value \
+                    and key != ConfigKeys.DISTRACTION.value \
+                    and key not in ConfigKeys.get_optional_values():
+                problems.append("no {0} found".format(key))
+
+        if problems:
+            return problems
+
+        participant_id = config[ConfigKeys.PARTICIPANT_ID.value]
+        is_stored_typed = ConfigKeys.COLUMNAR_DIRECTORY.value in config or ConfigKeys.COLLECTOR_ADDRESS.value in config
+        if is_stored_typed and (not isinstance(participant_id, int) or isinstance(participant_id, bool)):
+            # the typed columns store the participant id as integer (see PointingExperimentModel.COLUMN_TYPES)
+            problems.append("the participant id {0} is not an integer".format(participant_id))
+
+        for key in [ConfigKeys.THRESHOLD.value, ConfigKeys.DENSITY.value]:
+            if not isinstance(config[key], (int, float)) or isinstance(config[key], bool):
+                problems.append("the {0} {1} is not a number".format(key, config[key]))
+
+        if config[ConfigKeys.POINTER_TYPE.value] not in ConfigParsing.POINTER_TYPES:
+            problems.append("unknown pointer type {0}".format(config[ConfigKeys.POINTER_TYPE.value]))
+
+        for condition in config[ConfigKeys.CONDITIONS.value]:
+            for key in ConfigParsing.CONDITION_KEYS:
+                if key not in condition:
+                    problems.append("no {0} found in condition {1}".format(key, condition))
+
+        return problems
+
+    @staticmethod
+    def __get_file_version(file_name):
+        stat = os.stat(file_name)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    @staticmethod
+    def validate_study_plan(sessions):
+        """Returns a list of problems with the sessions of a study plan, the list is empty if they are valid."""
+        problems = []
+        for session_id, config in sessions.items():
+            problems += ["session {0}: {1}".format(session_id, problem)
+                         for problem in ConfigParsing.validate(config)]
+
+        return problems
+
+    @staticmethod
+    def write_study_plan_stamp(file_name):
+        """Records that the study plan file in its current version is valid (see study_plan.py)."""
+        stamp_file_name = file_name + ConfigParsing.STUDY_PLAN_STAMP_EXTENSION
+        try:
+            with open(stamp_file_name, "w") as file:
+                json.dump(ConfigParsing.__get_file_version(file_name), file)
+        except OSError:
+            # e.g. a read-only directory, the study plan is validated again by the next session
+            pass
+
+    @staticmethod
+    def __has_valid_study_plan_stamp(file_name):
+        try:
+            with open(file_name + ConfigParsing.STUDY_PLAN_STAMP_EXTENSION) as file:
+                return json.load(file) == ConfigParsing.__get_file_version(file_name)
+        except (OSError, ValueError):
+            return False
+
+    @staticmethod
+    def load_study_plan(file_name):
+        """
+        Returns the validated configs of all sessions of a study plan by their session id.
+        Every session of the experiment is a new process, so the result of the validation is stored in a stamp file
+        next to the study plan. The sessions are only validated again if the study plan has changed since.
+        """
+        with open(file_name) as file:
+            sessions = json.load(file)[ConfigParsing.STUDY_PLAN_SESSIONS]
+
+        if ConfigParsing.__has_valid_study_plan_stamp(file_name):
+            return sessions
+
+        problems = ConfigParsing.validate_study_plan(sessions)
+        if problems:
+            raise ValueError("\n".join(problems))
+
+        ConfigParsing.write_study_plan_stamp(file_name)
+
+        return sessions
+
+    def __init__(self, file_name=None, session_id=None):
+        # without a file name the first command line argument is used,
+        # a session of a study plan is selected with its session id (e.g. "3_2"), which the caller has to pass
+        self.file_name = file_name
+        self.session_id = session_id
         self.__config = self.__read_test_config()
         self.__exit_if_not_valid_config()
 
+    @staticmethod
+    def __parse_ini_value(value):
+        # the lists in ini files are usually valid json, which is parsed much faster than with ast
+        try:
+            return json.loads(value)
+        except ValueError:
+            # e.g. python syntax with single quotes
+            import ast
+            return ast.literal_eval(value)
+
     def __create_ini_config(self):
         config = configparser.ConfigParser()
         config.read(self.file_name)
 
         ini_dict = dict(config["DEFAULT"])
 
-        target_position_key = ConfigKeys.TARGET_POSITIONS.value
-        ini_dict[target_position_key] = ast.literal_eval((ini_dict[target_position_key]))
-
-        conditions_key = ConfigKeys.CONDITIONS.value
-        ini_dict[conditions_key] = ast.literal_eval((ini_dict[conditions_key]))
+        # e.g. techniques = ["bubble", "gain_switching"], missing keys are reported by validate
+        for key in [ConfigKeys.TARGET_POSITIONS.value, ConfigKeys.CONDITIONS.value, ConfigKeys.TECHNIQUES.value]:
+            if key in ini_dict:
+                ini_dict[key] = self.__parse_ini_value(ini_dict[key])
+
+        # all other values are strings in ini files, the numbers have the same types as in json files,
+        # missing keys and values which are not numbers are reported by validate
+        for key, convert in [(ConfigKeys.PARTICIPANT_ID.value, int), (ConfigKeys.THRESHOLD.value, float),
+                             (ConfigKeys.DENSITY.value, int)]:
+            if key in ini_dict:
+                try:
+                    ini_dict[key] = convert(ini_dict[key])
+                except ValueError:
+                    pass
 
         return ini_dict
 
     def __create_json_config(self):
         with open(self.file_name) as file:
-            return json.load(file)
+            config = json.load(file)
+
+        if self.STUDY_PLAN_SESSIONS in config:
+            return self.__select_study_plan_session()
+
+        return config
+
+    def __select_study_plan_session(self):
+        try:
+            sessions = self.load_study_plan(self.file_name)
+        except ValueError as error:
+            self.__exit_program("Invalid study plan (-_-)\n{0}\n".format(error))
+
+        if self.session_id not in sessions:
+            self.__exit_program("Please give the id of a session of the study plan (e.g. {0}) as argument (-_-)\n"
+                                .format(next(iter(sessions), "1_1")))
+
+        return sessions[self.session_id]
 
     def __read_test_config(self):
-        if len(sys.argv) < 2:
-            self.__exit_program()
+        if self.file_name is None:
+            if len(sys.argv) < 2:
+                self.__exit_program()
 
-        self.file_name = sys.argv[1]
+            self.file_name = sys.argv[1]
 
         if not os.path.isfile(self.file_name):
             self.__exit_program("File does not exist (-_-)\n")
@@ -58,19 +199,12 @@ class ConfigParsing:
             self.__exit_program()
 
     def __exit_if_not_valid_config(self):
-        missing_key = False
-
-        for key in ConfigKeys.get_all_values():
+        problems = self.validate(self.__config)
 
-            if key not in self.__config:
-                # sub elements of config file are not checked
-                if key != ConfigKeys.CIRCLE_SIZE.value \
-                        and key != ConfigKeys.CIRCLE_COUNT.value \
-                        and key != ConfigKeys.DISTRACTION.value:
-                    missing_key = True
-                    print("config: no {0} found".format(key))
+        for problem in problems:
+            print("config: {0}".format(problem))
 
-        if missing_key:
+        if problems:
             self.__exit_program()
 
     def get_config(self):
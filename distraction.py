@@ -0,0 +1,158 @@
+import random
+
+from PyQt5 import QtGui, QtCore
+
+"""
+Distraction of the pointing experiment, i.e. flickering circles ("circle_flicker") and additionally a flickering
+window background ("background_flicker").
+
+In every frame one circle is drawn in the background color and one in the flicker color. Instead of creating new
+colors for all circles on every tick, the DistractionEngine
+    - creates the colors and the palettes of the window once,
+    - computes the flicker schedule (which circles change their color in which frame) at the start of a trial,
+      with a seed made of the layout seed, the condition and the trial, so every participant sees the same flicker,
+    - only changes the color of the circles which were changed in the last frame or are changed in the current frame,
+      so only they are repainted, and only sets the palette of the window if the background color changes.
+The frame which is shown is computed from the time since the start of the trial and not from the number of timer
+ticks, so the flicker has the same speed for any number of circles. If a tick comes too late, the frames in between
+are skipped and counted as dropped frames, frames shown more than half an interval after their time are counted as
+late frames. Both counts are written to the results (see PointingExperimentModel).
+"""
+
+
+class DistractionEngine(QtCore.QObject):
+    NONE = "none"
+    CIRCLE_FLICKER = "circle_flicker"
+    BACKGROUND_FLICKER = "background_flicker"
+
+    # frame intervals in ms
+    INTERVALS = {
+        CIRCLE_FLICKER: 50,
+        BACKGROUND_FLICKER: 100
+    }
+
+    FLICKER_COLOR = "Yellow"
+
+    # number of frames of the schedule which are computed at once
+    SCHEDULE_LENGTH = 1200
+
+    # a tick this much before the time of a frame still shows the frame, as the timer is not exact
+    TIMER_TOLERANCE_NS = 2000000
+
+    def __init__(self, window, circle_color, background_color, clock):
+        super().__init__(window)
+
+        self.__window = window
+        self.__clock = clock
+
+        self.__circle_color = QtGui.QColor(circle_color)
+        self.__background_color = QtGui.QColor(background_color)
+        self.__flicker_color = QtGui.QColor(self.FLICKER_COLOR)
+
+        self.__background_palette = QtGui.QPalette(window.palette())
+        self.__background_palette.setColor(QtGui.QPalette.Window, self.__background_color)
+        self.__flicker_palette = QtGui.QPalette(window.palette())
+        self.__flicker_palette.setColor(QtGui.QPalette.Window, self.__flicker_color)
+
+        self.__timer = QtCore.QTimer(self)
+        self.__timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.__timer.timeout.connect(self.tick)
+
+        self.__circles = []
+        self.__random = random.Random()
+        self.__schedule = []
+        self.__interval_ns = 0
+        self.__enable_background_flicker = False
+        self.__is_background_flickering = False
+
+        self.__start_ns = 0
+        self.__frame = -1
+        self.__changed_circles = []
+        self.__dropped_frame_count = 0
+        self.__late_frame_count = 0
+
+    def __extend_schedule(self):
+        # per frame the index of the circle in the background color and of the circle in the flicker color
+        circle_count = len(self.__circles)
+        self.__schedule += [(self.__random.randrange(circle_count), self.__random.randrange(circle_count))
+                            for _ in range(self.SCHEDULE_LENGTH)]
+
+    def __show_frame(self, frame):
+        while frame >= len(self.__schedule):
+            self.__extend_schedule()
+
+        background_index, flicker_index = self.__schedule[frame]
+
+        for circle in self.__changed_circles:
+            circle.set_color(self.__circle_color)
+
+        # set_color only repaints a circle if its color changes
+        background_circle = self.__circles[background_index]
+        flicker_circle = self.__circles[flicker_index]
+        background_circle.set_color(self.__background_color)
+        flicker_circle.set_color(self.__flicker_color)
+        self.__changed_circles = [background_circle, flicker_circle]
+
+        if self.__enable_background_flicker:
+            self.__set_background_flicker(frame % 2 == 1)
+
+    def __set_background_flicker(self, is_flickering):
+        if self.__is_background_flickering == is_flickering:
+            return
+
+        self.__is_background_flickering = is_flickering
+        self.__window.setPalette(self.__flicker_palette if is_flickering else self.__background_palette)
+
+    def start(self, distraction, circles, seed=None):
+        self.stop()
+
+        self.__dropped_frame_count = 0
+        self.__late_frame_count = 0
+
+        if distraction == self.NONE or not circles:
+            return
+
+        self.__circles = circles
+        self.__random.seed(seed)
+        self.__schedule = []
+        self.__interval_ns = self.INTERVALS[distraction] * 1000000
+        self.__enable_background_flicker = distraction == self.BACKGROUND_FLICKER
+
+        # the first frame is shown one interval after the start, like with the timer before
+        self.__start_ns = self.__clock()
+        self.__frame = 0
+        self.__timer.start(self.INTERVALS[distraction])
+
+    def stop(self):
+        self.__timer.stop()
+
+        for circle in self.__changed_circles:
+            circle.set_color(self.__circle_color)
+
+        self.__changed_circles = []
+        self.__circles = []
+        self.__set_background_flicker(False)
+
+    def tick(self):
+        if not self.__circles:
+            return
+
+        elapsed_ns = self.__clock() - self.__start_ns
+        frame = int((elapsed_ns + self.TIMER_TOLERANCE_NS) // self.__interval_ns)
+
+        if frame <= self.__frame:
+            # too early, the current frame is still shown
+            return
+
+        self.__dropped_frame_count += frame - self.__frame - 1
+        if elapsed_ns - frame * self.__interval_ns > self.__interval_ns // 2:
+            self.__late_frame_count += 1
+
+        self.__frame = frame
+        self.__show_frame(frame)
+
+    def get_dropped_frame_count(self):
+        return self.__dropped_frame_count
+
+    def get_late_frame_count(self):
+        return self.__late_frame_count
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel
+
+"""
+Fitts' law metrics of the pointing experiment:
+    python3 fitts_metrics.py <columnar directory>   (see ingest_sessions.py)
+
+Per trial (only the clicks on the target with a valid task completion time):
+    - ID = log2(D / W + 1), with the distance D from the start position to the target centre and the circle size W
+    - the deviation dx of the click position from the target centre along the movement direction, i.e. the click
+      position projected onto the line from the start position to the target centre
+Per group (by default participant x condition x pointer type):
+    - the effective width We = 4.133 * SD of dx. dx is relative to the target of every trial, so trials with
+      different targets can be pooled.
+    - the effective index of difficulty IDe = log2(De / We + 1) with the mean effective distance De = mean(D + dx)
+    - the throughput TP = IDe / MT in bit/s with the mean movement time MT in s
+    - the number of errors, i.e. clicks next to the target
+    - the linear regression MT = a + b * ID with a in ms, b in ms/bit and the coefficient of determination r²
+
+All positions are window coordinates. Results without the target centre (recorded before it was stored) and clicks in
+screen coordinates (see PointingExperimentModel.CLICK_POSITION_FRAME) have no metrics.
+
+Everything is computed with vectorized pandas and numpy operations, there are no loops over the rows.
+"""
+
+GROUP_COLUMNS = [ConfigKeys.PARTICIPANT_ID.value, PointingExperimentModel.CONDITION, ConfigKeys.POINTER_TYPE.value]
+
+# names of the computed columns
+TARGET_DISTANCE = "target_distance"
+END_POINT_DEVIATION = "end_point_deviation"
+INDEX_OF_DIFFICULTY = "index_of_difficulty"
+EFFECTIVE_WIDTH = "effective_width"
+EFFECTIVE_INDEX_OF_DIFFICULTY = "effective_index_of_difficulty"
+THROUGHPUT = "throughput_in_bits_per_s"
+MEAN_MOVEMENT_TIME = "mean_movement_time_in_ms"
+TRIAL_COUNT = "trial_count"
+ERROR_COUNT = "error_count"
+INTERCEPT = "intercept_in_ms"
+SLOPE = "slope_in_ms_per_bit"
+R_SQUARED = "r_squared"
+
+EFFECTIVE_WIDTH_FACTOR = 4.133
+
+
+def compute_trial_metrics(results):
+    """Returns the successful trials of the results with the additional columns target_distance, end_point_deviation
+    and index_of_difficulty."""
+    in_window_frame = results[PointingExperimentModel.CLICK_POSITION_FRAME] == PointingExperimentModel.FRAME_WINDOW
+    trials = results[results[PointingExperimentModel.IS_TARGET]
+                     & results[PointingExperimentModel.TASK_COMPLETION_TIME].notna() & in_window_frame].copy()
+
+    def get_positions(x_column, y_column):
+        return trials[x_column].to_numpy(dtype=float), trials[y_column].to_numpy(dtype=float)
+
+    start_x, start_y = get_positions(PointingExperimentModel.MOUSE_START_POSITION_X,
+                                     PointingExperimentModel.MOUSE_START_POSITION_Y)
+    target_x, target_y = get_positions(PointingExperimentModel.TARGET_CENTER_X, PointingExperimentModel.TARGET_CENTER_Y)
+    click_x, click_y = get_positions(PointingExperimentModel.MOUSE_CLICKED_POSITION_X,
+                                     PointingExperimentModel.MOUSE_CLICKED_POSITION_Y)
+
+    distance = np.hypot(target_x - start_x, target_y - start_y)
+    width = trials[ConfigKeys.CIRCLE_SIZE.value].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # positive if the click is behind the target centre, negative if it is in front of it
+        deviation = ((click_x - target_x) * (target_x - start_x) + (click_y - target_y) * (target_y - start_y)) \
+            / distance
+
+    trials[TARGET_DISTANCE] = distance
+    trials[END_POINT_DEVIATION] = deviation
+    trials[INDEX_OF_DIFFICULTY] = np.log2(distance / width + 1)
+
+    return trials
+
+
+def compute_group_metrics(results, group_columns=GROUP_COLUMNS):
+    trials = compute_trial_metrics(results)
+    trials["effective_distance"] = trials[TARGET_DISTANCE] + trials[END_POINT_DEVIATION]
+    movement_time = PointingExperimentModel.TASK_COMPLETION_TIME
+
+    metrics = trials.groupby(group_columns).agg(**{
+        MEAN_MOVEMENT_TIME: (movement_time, "mean"),
+        TRIAL_COUNT: (movement_time, "size"),
+        "mean_distance": ("effective_distance", "mean"),
+        EFFECTIVE_WIDTH: (END_POINT_DEVIATION, "std")
+    })
+    metrics[EFFECTIVE_WIDTH] *= EFFECTIVE_WIDTH_FACTOR
+    metrics[EFFECTIVE_INDEX_OF_DIFFICULTY] = np.log2(metrics["mean_distance"] / metrics[EFFECTIVE_WIDTH] + 1)
+    metrics[THROUGHPUT] = metrics[EFFECTIVE_INDEX_OF_DIFFICULTY] / (metrics[MEAN_MOVEMENT_TIME] / 1000)
+
+    errors = results[group_columns].assign(**{ERROR_COUNT: ~results[PointingExperimentModel.IS_TARGET].astype(bool)})
+    metrics[ERROR_COUNT] = errors.groupby(group_columns)[ERROR_COUNT].sum().reindex(metrics.index, fill_value=0)
+
+    return metrics.join(fit_regression(trials, group_columns))
+
+
+def fit_regression(trials, group_columns=GROUP_COLUMNS):
+    """Fits MT = a + b * ID per group with the least squares sums of every group."""
+    x = trials[INDEX_OF_DIFFICULTY].to_numpy(dtype=float)
+    y = trials[PointingExperimentModel.TASK_COMPLETION_TIME].to_numpy(dtype=float)
+
+    sums = trials[group_columns].assign(n=1, x=x, y=y, xx=x * x, xy=x * y, yy=y * y).groupby(group_columns).sum()
+
+    n = sums["n"]
+    sxx = sums["xx"] - sums["x"] ** 2 / n
+    sxy = sums["xy"] - sums["x"] * sums["y"] / n
+    syy = sums["yy"] - sums["y"] ** 2 / n
+
+    slope = sxy / sxx
+    intercept = (sums["y"] - slope * sums["x"]) / n
+
+    return pd.DataFrame({
+        INTERCEPT: intercept,
+        SLOPE: slope,
+        R_SQUARED: sxy ** 2 / (sxx * syy)
+    })
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: fitts_metrics.py <columnar directory>\n")
+        sys.exit(1)
+
+    from columnar_store import load_dataframe
+
+    pd.set_option("display.width", 200)
+    print(compute_group_metrics(load_dataframe(sys.argv[1])))
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import ColumnarWriter
+from pointing_experiment_model import PointingExperimentModel
+
+"""
+Collects the CSV files of all sessions into one typed columnar dataset (see columnar_store.py):
+    python3 ingest_sessions.py <session directory> <output columnar directory> [chunk size]
+
+All files in the session directory and its subdirectories whose names match SESSION_FILE_PATTERN
+(<participant>_<session>_<pointer type>.csv, e.g. 1_2_novel.csv) are session files. Combined or filtered tables
+like filtered_data.csv are therefore not read again.
+The columns of every session file are validated against PointingExperimentModel.COLUMN_TYPES: all columns of the
+original CSV format are required, the columns that were added later are optional and filled with NaN if they are
+missing, other columns are not allowed. Invalid files are reported and skipped.
+Sessions without the column click_position_frame stored the clicks on the circles in screen coordinates, their rows
+get the frame "screen" (see OPTIONAL_COLUMN_VALUES), so they can be told apart from the clicks in window coordinates.
+
+The files are read in chunks of chunk size rows, which are converted to the column types and appended to the dataset,
+so the memory usage does not depend on the number of sessions. The name of the session file is stored in the
+additional column "session".
+"""
+
+SESSION_FILE_PATTERN = re.compile(r"^\d+_\d+_\w+\.csv$")
+SESSION_COLUMN = "session"
+DEFAULT_CHUNK_SIZE = 100000
+
+# columns which were added after the first studies (see PointingExperimentModel)
+OPTIONAL_COLUMNS = [
+    PointingExperimentModel.HANDLER_TASK_COMPLETION_TIME,
+    PointingExperimentModel.INPUT_TO_HANDLER_DELAY,
+    PointingExperimentModel.DROPPED_DISTRACTION_FRAMES,
+    PointingExperimentModel.LATE_DISTRACTION_FRAMES,
+    PointingExperimentModel.TECHNIQUE_OVERRUNS,
+    PointingExperimentModel.TECHNIQUE_MAX_LATENCY,
+    PointingExperimentModel.TARGET_CENTER_X,
+    PointingExperimentModel.TARGET_CENTER_Y,
+    PointingExperimentModel.TECHNIQUE_STALL_TIME,
+    PointingExperimentModel.CLICK_POSITION_FRAME,
+    PointingExperimentModel.DROPPED_TRAJECTORY_SAMPLES
+] + PointingExperimentModel.TELEMETRY_COLUMNS
+
+# values of the optional columns for the sessions without them, all other optional columns are filled with NaN
+OPTIONAL_COLUMN_VALUES = {
+    PointingExperimentModel.CLICK_POSITION_FRAME: PointingExperimentModel.FRAME_SCREEN
+}
+
+
+def find_session_files(directory):
+    session_files = []
+
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if SESSION_FILE_PATTERN.match(file_name):
+                session_files.append(os.path.join(root, file_name))
+
+    return sorted(session_files)
+
+
+def get_column_types():
+    column_types = list(PointingExperimentModel.COLUMN_TYPES.items())
+    column_types.append((SESSION_COLUMN, "str"))
+
+    return column_types
+
+
+def validate_columns(columns):
+    """Returns a list of problems with the columns of a session file, the list is empty if they are valid."""
+    problems = []
+    expected_columns = PointingExperimentModel.COLUMN_TYPES
+
+    for column in expected_columns:
+        if column not in columns and column not in OPTIONAL_COLUMNS:
+            problems.append("column {0} is missing".format(column))
+
+    for column in columns:
+        if column not in expected_columns:
+            problems.append("unknown column {0}".format(column))
+
+    return problems
+
+
+def convert_chunk(chunk, session):
+    # returns one array per column in the order of get_column_types
+    columns = []
+
+    for column, column_type in get_column_types():
+        if column == SESSION_COLUMN:
+            columns.append(np.full(len(chunk), session))
+        elif column not in chunk:
+            columns.append(np.full(len(chunk), OPTIONAL_COLUMN_VALUES.get(column, np.nan)))
+        elif column_type == "datetime":
+            columns.append(pd.to_datetime(chunk[column], format="ISO8601").to_numpy())
+        elif column_type == "bool":
+            columns.append(chunk[column].astype(str).str.lower().eq("true").to_numpy())
+        elif column_type == "str":
+            columns.append(chunk[column].astype(str).to_numpy())
+        else:
+            columns.append(pd.to_numeric(chunk[column], errors="raise").to_numpy())
+
+    return columns
+
+
+def ingest_session_file(writer, file_name, chunk_size):
+    header = pd.read_csv(file_name, nrows=0).columns
+    problems = validate_columns(header)
+
+    if problems:
+        raise ValueError(", ".join(problems))
+
+    session = os.path.splitext(os.path.basename(file_name))[0]
+    row_count = 0
+
+    # everything is read as text and converted per column, only "NaN" is read as missing value
+    for chunk in pd.read_csv(file_name, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=["NaN"]):
+        writer.write_columns(convert_chunk(chunk, session))
+        row_count += len(chunk)
+
+    return row_count
+
+
+def ingest_sessions(directory, output_directory, chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = ColumnarWriter(output_directory, get_column_types())
+    total_row_count = 0
+
+    for file_name in find_session_files(directory):
+        previous_row_count = writer.get_row_count()
+
+        try:
+            row_count = ingest_session_file(writer, file_name, chunk_size)
+        except ValueError as error:
+            # the chunks of the file which were already written are removed again
+            writer.truncate(previous_row_count)
+            sys.stderr.write("skipped {0}: {1}\n".format(file_name, error))
+            continue
+
+        writer.flush()
+        total_row_count += row_count
+        sys.stderr.write("{0}: {1} rows\n".format(file_name, row_count))
+
+    writer.close()
+
+    return total_row_count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.stderr.write("usage: ingest_sessions.py <session directory> <output columnar directory> [chunk size]\n")
+        sys.exit(1)
+
+    ingested_row_count = ingest_sessions(sys.argv[1], sys.argv[2],
+                                         int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CHUNK_SIZE)
+    sys.stderr.write("{0} rows in total\n".format(ingested_row_count))
@@ -0,0 +1,65 @@
+import time
+
+"""
+Monotonic high resolution clock for the task completion times.
+
+Instead of the difference of two datetime.now() calls in the Python slots, the times are measured with
+time.perf_counter_ns, and for mouse events the timestamp of the event itself (QMouseEvent.timestamp(), in ms) is used.
+The event timestamps come from a different clock, therefore the offset between both clocks is estimated as the
+smallest difference between the time at which an event was handled and its timestamp seen so far.
+The input to handler delay of an event is the time between the mapped event timestamp and the moment
+in which the event was handled, i.e. the delay caused by the event loop and by Qt in addition to the fastest event.
+The estimate is biased at the start of a session: the delay of the first event is always 0, and the delays are too
+small until an event which was handled faster has been seen. The offset only decreases, so the mapped times of two
+events can differ by the change of the offset in between (at most the delay of the earlier event).
+
+For tests or simulations a different clock function returning nanoseconds can be passed.
+"""
+
+
+class InputTime:
+
+    def __init__(self, input_ns, handler_ns):
+        self.input_ns = input_ns
+        self.handler_ns = handler_ns
+
+    def get_delay_in_ms(self):
+        return (self.handler_ns - self.input_ns) / 1000000
+
+
+class InputClock:
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.__clock = clock
+        self.__offset = None
+
+    def now(self):
+        return self.__clock()
+
+    def map_event_timestamp(self, event_timestamp):
+        handler_ns = self.__clock()
+
+        return InputTime(self.__map(event_timestamp, handler_ns), handler_ns)
+
+    def map_event_timestamp_ns(self, event_timestamp):
+        # same as map_event_timestamp, but only returns the mapped time without creating an InputTime
+        return self.__map(event_timestamp, self.__clock())
+
+    def get_delay_ns(self, event_timestamp):
+        # input to handler delay of an event handled now, same as map_event_timestamp(...).get_delay_in_ms() in ns
+        handler_ns = self.__clock()
+
+        return handler_ns - self.__map(event_timestamp, handler_ns)
+
+    def __map(self, event_timestamp, handler_ns):
+        # synthesized events have no timestamp
+        if not event_timestamp:
+            return handler_ns
+
+        event_ns = event_timestamp * 1000000
+        offset = handler_ns - event_ns
+
+        if self.__offset is None or offset < self.__offset:
+            self.__offset = offset
+
+        return event_ns + self.__offset
@@ -0,0 +1,90 @@
+import math
+
+from PyQt5 import QtCore
+
+"""
+Coalesces the mouse move events for the consumers which do not need every sample, e.g. the pointing techniques.
+
+A mouse with a high polling rate (1000 Hz) sends a mouse move event every millisecond, but a pointing technique only
+has to see the latest position about once per frame. Every consumer is added with its sample interval: a new
+position is passed to the consumer at once if the last one was passed at least one interval ago, otherwise only the
+latest position is passed when the interval is over (a throttle with leading and trailing edge). So the first move
+after a pause is never delayed, and the last position of a movement is never lost.
+A sample interval of 0 passes every position.
+
+The recorders which need the full rate, i.e. the trajectory recorder and the telemetry, still get every event.
+The time of the samples is taken from the clock of the session, so simulated sessions are coalesced the same way.
+"""
+
+
+class _Consumer:
+
+    def __init__(self, callback, interval_ns):
+        self.callback = callback
+        self.interval_ns = interval_ns
+        self.last_ns = None
+        self.is_pending = False
+
+
+class MoveCoalescer(QtCore.QObject):
+
+    def __init__(self, clock, parent=None):
+        super().__init__(parent)
+
+        self.__clock = clock
+        self.__consumers = []
+        self.__position = None
+
+        self.__timer = QtCore.QTimer(self)
+        self.__timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.__timer.setSingleShot(True)
+        self.__timer.timeout.connect(self.__on_timer)
+        self.__timer_due_ns = None
+
+    def add_consumer(self, callback, sample_interval):
+        # sample_interval in ms, callback is called with the position
+        self.__consumers.append(_Consumer(callback, int(sample_interval * 1000000)))
+
+    def submit(self, position):
+        if not self.__consumers:
+            # e.g. with the normal pointer
+            return
+
+        self.__position = position
+
+        for consumer in self.__consumers:
+            consumer.is_pending = True
+
+        self.__dispatch(self.__clock())
+
+    def reset(self):
+        # the positions of the last trial are not passed to the techniques of the next trial
+        self.__timer.stop()
+        self.__timer_due_ns = None
+
+        for consumer in self.__consumers:
+            consumer.last_ns = None
+            consumer.is_pending = False
+
+    def __on_timer(self):
+        self.__timer_due_ns = None
+        self.__dispatch(self.__clock())
+
+    def __dispatch(self, now_ns):
+        next_due_ns = None
+
+        for consumer in self.__consumers:
+            if not consumer.is_pending:
+                continue
+
+            if consumer.last_ns is None or now_ns - consumer.last_ns >= consumer.interval_ns:
+                consumer.is_pending = False
+                consumer.last_ns = now_ns
+                consumer.callback(self.__position)
+            else:
+                due_ns = consumer.last_ns + consumer.interval_ns
+                next_due_ns = due_ns if next_due_ns is None else min(next_due_ns, due_ns)
+
+        if next_due_ns is not None and (self.__timer_due_ns is None or next_due_ns < self.__timer_due_ns):
+            self.__timer_due_ns = next_due_ns
+            self.__timer.start(max(math.ceil((next_due_ns - now_ns) / 1000000), 0))
@@ -1,18 +1,27 @@
 #!/usr/bin/python3
 
-import random
+import os
 import sys
+import time
 from math import dist
 
 from PyQt5 import QtGui, QtWidgets, QtCore
 from PyQt5.QtCore import pyqtSignal
 
+from circle_canvas import CircleCanvas
+from circle_layout import CircleLayout
+from circle_pool import CirclePool
 from config_parsing import ConfigParsing
-from pointing_experiment_model import PointingExperimentModel
-from pointing_technique import PointingTechnique
+from distraction import DistractionEngine
+from input_coalescer import MoveCoalescer
+from pointing_experiment_model import PointingExperimentModel, ConfigKeys
+from telemetry import Telemetry
+from trajectory_recorder import TrajectoryRecorder
+from virtual_pointer_device import VirtualPointerDevice
 
 """
-The program must be run with sudo because the novel pointer requires root privileges to manipulate the mouse cursors.
+The program must be run with sudo if the novel pointer is used, because it requires root privileges to manipulate
+the mouse cursors. The pointing technique and evdev are only loaded for the novel pointer.
 For setting the mouse to a fixed position we did not use QtGui.QCursor.setPos() because doing so and integrating the
 mouse pointer caused problems like the cursor jumping up and down.
 Instead, we decided to place a blue circle in the left corner of the window that had to be clicked to start, which
@@ -21,6 +30,10 @@ also leads to roughly the same mouse start position.
 The study was not carried out in a virtual environment but in the main operating system (Manjaro). The reason for
 this was that in the VM the mouse sometimes got stuck despite or just because of the integration of the mouse pointer.
 
+If the environment variable POINTING_EXPERIMENT_STARTUP_TIMING is set, the durations of the startup phases
+(CPU time of the interpreter start and the imports, reading the config, creating the QApplication and the MainWindow,
+showing the first frame) are written to stderr and the program quits after the first frame.
+
 The features of the program were discussed together and everyone got their own tasks.
 The authors of the python and sub files are written at the beginning of the python files.
 """
@@ -29,13 +42,12 @@ The authors of the python and sub files are written at the beginning of the pyth
 # Main author: Sarah
 # Reviewer: Claudia
 class CircleWidget(QtWidgets.QWidget):
-    clicked = pyqtSignal([QtCore.QPoint])
+    clicked = pyqtSignal([QtCore.QPoint, object])
 
     def __init__(self, parent=None):
         super(CircleWidget, self).__init__(parent)
 
         self.setAttribute(QtCore.Qt.WA_StaticContents)
-        self.setMouseTracking(True)
 
         self.__radius = 0
         self.__is_target = False
@@ -89,7 +101,7 @@ class CircleWidget(QtWidgets.QWidget):
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton \
                 and dist([self.__radius, self.__radius], [event.x(), event.y()]) <= self.__radius:
-            self.clicked.emit(event.globalPos())
+            self.clicked.emit(event.globalPos(), event.timestamp())
 
 
 # Main author: Sarah
@@ -97,14 +109,10 @@ class CircleWidget(QtWidgets.QWidget):
 class MainWindow(QtWidgets.QWidget):
     mouse_target_color = "Blue"
 
-    @staticmethod
-    def get_random_pos(max_x, max_y):
-        return random.randint(0, max_x), random.randint(0, max_y)
-
-    def __init__(self, config):
+    def __init__(self, config, pointer_device=None, input_clock=None, headless=False):
         super(MainWindow, self).__init__()
 
-        self.setFixedSize(800, 600)
+        self.setFixedSize(PointingExperimentModel.WINDOW_WIDTH, PointingExperimentModel.WINDOW_HEIGHT)
         self.move(QtWidgets.qApp.desktop().availableGeometry(self).center() - self.rect().center())
 
         self.setWindowTitle("Fitts Law Test")
@@ -112,16 +120,163 @@ class MainWindow(QtWidgets.QWidget):
         self.setMouseTracking(True)
 
         self.__circles = []
-        self.__model = PointingExperimentModel(config)
+        # in headless mode no dialogs are shown, e.g. for the simulated participant (see simulated_participant.py)
+        self.__headless = headless
+        self.__is_finished = False
+
+        try:
+            self.__model = PointingExperimentModel(config, input_clock)
+        except ValueError as error:
+            # the journal of the session does not match the config file
+            sys.stderr.write("{0}\n".format(error))
+            sys.exit(1)
+
+        # queued, as the signal is emitted by the background thread of the ResultWriter
+        self.__model.result_error.connect(self.__handle_result_error)
+        if self.__model.get_result_error():
+            # the rows of a resumed session could not be written again before the signal was connected
+            QtCore.QTimer.singleShot(0, lambda: self.__handle_result_error(self.__model.get_result_error()))
+
+        self.__layout = CircleLayout(self.width(), self.height(), self.__model.get_layout_seed())
+        self.__skip_resumed_layouts()
         self.__pointing_technique = None
+        self.__pointing_technique_class = None
+        self.__pointer_device = pointer_device
+
+        self.__technique_pipeline = None
+        self.__technique_generation = None
+        self.__selected_circle_index = None
+        self.__technique_move_remainder = (0.0, 0.0)
+        self.__last_move_ns = None
+
+        self.__trajectory_recorder = None
+        self.__is_recording = False
+        if self.__model.get_trajectory_directory():
+            self.__trajectory_recorder = TrajectoryRecorder(self.__model.get_trajectory_directory(),
+                                                            self.__model.get_participant_id(),
+                                                            self.__model.get_pointer(),
+                                                            collector_sink=self.__model.get_collector_sink())
+
+        self.__distraction_engine = None
+
+        # Mouse moves without a pressed button only reach the window over a circle (or the canvas) if the circle
+        # tracks the mouse and passes the move on. This costs a Python call per move and circle under the cursor,
+        # so the circles only track the mouse if the positions are needed, i.e. by a pointing technique or the
+        # trajectory recorder.
+        self.__is_tracking_circles = self.__model.get_pointer() == "novel" or self.__trajectory_recorder is not None
+
+        self.__canvas = None
+        if self.__model.get_renderer() == PointingExperimentModel.RENDERER_CANVAS:
+            self.__canvas = CircleCanvas(self)
+            self.__canvas.setFixedSize(self.size())
+            self.__canvas.setMouseTracking(self.__is_tracking_circles)
+            self.__canvas.clicked.connect(self.__canvas_circle_clicked)
+
+        self.__circle_pool = CirclePool(self.__create_circle, self.__destroy_circle)
+
+        self.__telemetry = Telemetry(self.__model.get_input_clock(),
+                                     [widget for widget in [self, self.__canvas] if widget], self)
+
+        self.__move_coalescer = MoveCoalescer(self.__model.get_input_clock().now, self)
 
-        self.__color_timer = QtCore.QTimer(self)
-        self.__color_timer.setInterval(100)
-        self.__color_timer.timeout.connect(self.__on_timeout)
-        self.__enable_background_flicker = False
+        if self.__model.get_pointer() == "novel":
+            self.__load_pointer_backend()
 
+        self.__exit_if_layout_impossible(config)
         self.__setup_ui()
 
+    def __skip_resumed_layouts(self):
+        # creates the layouts of the trials completed before a resume again, so a seeded layout generator creates
+        # the same layouts for the remaining trials as in the interrupted session
+        if self.__model.get_layout_seed() is None or self.__model.get_distractor_positions() is not None:
+            return
+
+        for count, diameter, target_position in self.__model.get_resumed_trials():
+            self.__layout.create_positions(count - 1, diameter, target_position)
+
+    def __load_pointer_backend(self):
+        # the pointing technique and evdev are only loaded for the novel pointer,
+        # so sessions with the normal pointer start faster and without evdev or root privileges
+        if self.__model.get_techniques():
+            self.__create_technique_pipeline(self.__model.get_techniques())
+            self.__move_coalescer.add_consumer(self.__submit_to_technique_pipeline,
+                                               self.__technique_pipeline.get_sample_interval())
+        else:
+            from pointing_technique import PointingTechnique
+            self.__pointing_technique_class = PointingTechnique
+            self.__move_coalescer.add_consumer(self.__filter_pointing_technique, PointingTechnique.sample_interval)
+
+        if self.__pointer_device is None:
+            # one virtual device for the whole session, it is closed when the experiment is finished
+            self.__pointer_device = VirtualPointerDevice()
+
+            try:
+                self.__pointer_device.open()
+            except ImportError:
+                sys.stderr.write("The novel pointer needs evdev (-_-)\n")
+                sys.exit(1)
+
+    def __create_technique_pipeline(self, techniques):
+        from technique_pipeline import TechniquePipeline
+
+        try:
+            stages = TechniquePipeline.create_stages(techniques)
+        except ValueError as error:
+            sys.stderr.write("{0}\n".format(error))
+            sys.exit(1)
+
+        self.__technique_pipeline = TechniquePipeline(stages, parent=self)
+        self.__technique_pipeline.result_ready.connect(self.__on_technique_result)
+        self.__technique_pipeline.start()
+
+    def __on_technique_result(self, result):
+        if result.generation != self.__technique_generation:
+            return
+
+        if result.selected_index is not None:
+            self.__selected_circle_index = result.selected_index
+
+        # the device only moves by whole pixels, the rest is added to the next movement
+        move_x = result.move_x + self.__technique_move_remainder[0]
+        move_y = result.move_y + self.__technique_move_remainder[1]
+        rel_x, rel_y = int(move_x), int(move_y)
+        self.__technique_move_remainder = (move_x - rel_x, move_y - rel_y)
+
+        if rel_x != 0 or rel_y != 0:
+            self.__technique_pipeline.add_injected_movement(rel_x, rel_y, self.__model.get_input_clock().now())
+            self.__pointer_device.move(rel_x, rel_y)
+            self.__pointer_device.flush()
+
+    def __set_technique_circles(self, circles):
+        if not self.__technique_pipeline:
+            return
+
+        self.__selected_circle_index = None
+        self.__technique_move_remainder = (0.0, 0.0)
+        self.__technique_pipeline.reset_statistics()
+        self.__technique_generation = self.__technique_pipeline.set_circles([circle.geometry() for circle in circles])
+
+    def __get_selected_circle(self):
+        # circle selected by the technique pipeline, which is clicked instead of the circle under the cursor
+        if self.__selected_circle_index is None or self.__selected_circle_index < 0:
+            return None
+
+        return self.__circles[self.__selected_circle_index]
+
+    def __exit_if_layout_impossible(self, config):
+        # the maximum number of circles is known in advance, so impossible conditions are reported before the start
+        for condition in config[ConfigKeys.CONDITIONS.value]:
+            diameter = condition[ConfigKeys.CIRCLE_SIZE.value]
+            count = condition[ConfigKeys.CIRCLE_COUNT.value]
+
+            for target_pos in config[ConfigKeys.TARGET_POSITIONS.value]:
+                capacity = self.__layout.get_capacity(diameter, target_pos)
+
+                if count - 1 > capacity:
+                    sys.stderr.write("condition {0}: only {1} circles with a size of {2} fit next to the target\n"
+                                     .format(condition["id"], capacity + 1, diameter))
+                    sys.exit(1)
+
     def __setup_ui(self):
         self.setAutoFillBackground(True)
         palette = QtGui.QGuiApplication.palette()
@@ -129,6 +284,10 @@ class MainWindow(QtWidgets.QWidget):
         palette.setColor(QtGui.QPalette.Window, background_color)
         self.setPalette(palette)
 
+        self.__distraction_engine = DistractionEngine(self, self.__model.get_circle_color(),
+                                                      self.__model.get_background_color(),
+                                                      self.__model.get_input_clock().now)
+
         mouse_target = CircleWidget(self)
         mouse_target.set_diameter(50)
         mouse_target.set_color(QtGui.QColor(self.mouse_target_color))
@@ -139,63 +298,72 @@ class MainWindow(QtWidgets.QWidget):
         self.__show_intro()
 
     def __show_intro(self):
+        if self.__model.is_session_completed():
+            # all trials were completed before the session was resumed, only the results are written again
+            self.__finish()
+            if not self.__headless:
+                QtWidgets.QMessageBox.information(self, self.windowTitle(), "Experiment finished!")
+                QtCore.QTimer.singleShot(0, QtWidgets.qApp.quit)
+            return
+
         target_color = self.__model.get_target_color().lower()
         mouse_target_color = self.mouse_target_color.lower()
-        QtWidgets.QMessageBox.information(self, self.windowTitle(),
-                                          "Click on the {0} circle to start and\nthen try to hit the {1} circle".format(
-                                              mouse_target_color, target_color))
+        if not self.__headless:
+            QtWidgets.QMessageBox.information(self, self.windowTitle(),
+                                              "Click on the {0} circle to start and\nthen try to hit the {1} circle"
+                                              .format(mouse_target_color, target_color))
         self.__clear_screen()
 
-    def __on_timeout(self):
-        for circle in self.__circles:
-            circle_color = QtGui.QColor(self.__model.get_circle_color())
-            circle.set_color(circle_color)
+    def __circle_clicked(self, position, event_timestamp):
+        self.__handle_circle_clicked(position, self.sender(), event_timestamp)
 
-        background_color = QtGui.QColor(self.__model.get_background_color())
-        random.choice(self.__circles).set_color(background_color)
-        random.choice(self.__circles).set_color(QtGui.QColor("Yellow"))
+    def __canvas_circle_clicked(self, position, circle, event_timestamp):
+        self.__handle_circle_clicked(position, circle, event_timestamp)
 
-        if self.__enable_background_flicker:
-            palette = self.palette()
+    def __handle_circle_clicked(self, position, circle, event_timestamp):
+        circle = self.__get_selected_circle() or circle
 
-            if palette.color(QtGui.QPalette.Window) == background_color:
-                palette.setColor(QtGui.QPalette.Window, QtGui.QColor("Yellow"))
-            else:
-                palette.setColor(QtGui.QPalette.Window, background_color)
+        self.__cancel_pointing_technique()
+        self.__telemetry.record_input(event_timestamp)
+        # the circles report the global position, the model stores window coordinates like for the start position
+        position = self.mapFromGlobal(position)
 
-            self.setPalette(palette)
+        if self.__is_recording:
+            t_ns = self.__model.get_input_clock().map_event_timestamp_ns(event_timestamp)
+            self.__trajectory_recorder.record_click(t_ns, position.x(), position.y(), int(QtCore.Qt.LeftButton))
 
-    def __circle_clicked(self, position):
-        self.__model.handle_circle_clicked(position, self.sender().is_target())
+        self.__report_trial_statistics()
+        self.__model.handle_circle_clicked(position, circle.is_target(), event_timestamp)
 
-        if self.sender().is_target():
+        if circle.is_target():
+            self.__stop_recording()
             self.__clear_screen()
 
     def __clear_screen(self):
         if self.__circles:
-            self.__color_timer.stop()
-
-            for circle in self.__circles:
-                circle.setParent(None)
-                circle.deleteLater()
+            self.__distraction_engine.stop()
+            self.__telemetry.end_trial()
 
+            # the circles are only hidden and reused in the next trial
+            self.__circle_pool.release()
             self.__circles.clear()
+            self.__set_technique_circles([])
             if not self.__model.select_next_target():
-                QtWidgets.QMessageBox.information(self, self.windowTitle(), "Experiment finished!")
-                QtWidgets.qApp.quit()
+                self.__finish()
+                if not self.__headless:
+                    QtWidgets.QMessageBox.information(self, self.windowTitle(), "Experiment finished!")
+                    QtWidgets.qApp.quit()
                 return
 
-        if self.__enable_background_flicker:
-            palette = self.palette()
-            palette.setColor(QtGui.QPalette.Window, QtGui.QColor(self.__model.get_background_color()))
-            self.setPalette(palette)
-
+        self.__cancel_pointing_technique()
         self.__pointing_technique = None
+        self.__move_coalescer.reset()
         self.__mouse_target.show()
         self.update()
 
-    def __setup_circles(self):
-        self.__model.set_mouse_start_position(self.mapFromGlobal(QtGui.QCursor.pos()))
+    def __setup_circles(self, position=None, event_timestamp=None):
+        # position is the global position of the click on the start circle
+        self.__model.set_mouse_start_position(self.mapFromGlobal(position if position else QtGui.QCursor.pos()))
         self.__mouse_target.hide()
         self.__create_circles(self.__model.get_circle_count(), self.__model.get_circle_size())
 
@@ -209,82 +377,238 @@ class MainWindow(QtWidgets.QWidget):
 
         self.update()
         self.__setup_distraction()
-        self.__model.start_timer()
+        self.__set_technique_circles(self.__circles)
+        self.__telemetry.start_trial()
+        self.__start_recording()
+        self.__model.start_timer(event_timestamp)
 
     def __setup_distraction(self):
-        distraction = self.__model.get_distraction()
-        if distraction == "none":
-            return
+        # with a layout seed every participant sees the same flicker in the same trial
+        seed = None
+        if self.__model.get_layout_seed() is not None:
+            seed = "{0}_{1}_{2}".format(self.__model.get_layout_seed(), self.__model.get_condition_id(),
+                                        self.__model.get_trial_index())
+
+        self.__distraction_engine.start(self.__model.get_distraction(), self.__circles, seed)
+
+    def __report_trial_statistics(self):
+        # statistics of the current trial, which are written with the next result row
+        self.__model.set_distraction_frames(self.__distraction_engine.get_dropped_frame_count(),
+                                            self.__distraction_engine.get_late_frame_count())
+        self.__model.set_telemetry_summary(self.__telemetry.get_summary())
+
+        if self.__technique_pipeline:
+            self.__model.set_technique_statistics(self.__technique_pipeline.get_overrun_count(),
+                                                  self.__technique_pipeline.get_max_latency_in_ms())
 
-        if distraction == "background_flicker":
-            self.__enable_background_flicker = True
-            self.__color_timer.setInterval(100)
-        elif distraction == "circle_flicker":
-            self.__enable_background_flicker = False
-            self.__color_timer.setInterval(50)
+        if self.__pointing_technique:
+            self.__model.set_technique_stall_time(self.__pointing_technique.get_stall_time_in_ms())
 
-        self.__color_timer.start()
+        if self.__is_recording:
+            self.__model.set_dropped_trajectory_samples(self.__trajectory_recorder.get_dropped_sample_count())
 
-    def __create_target(self, diameter):
-        target = CircleWidget(self)
+    def __create_circle(self):
+        # the canvas renderer draws all circles itself, otherwise every circle is its own widget
+        if self.__canvas:
+            return self.__canvas.create_item()
+
+        circle = CircleWidget(self)
+        circle.setMouseTracking(self.__is_tracking_circles)
+        circle.hide()
+        circle.clicked.connect(self.__circle_clicked)
+
+        return circle
+
+    def __destroy_circle(self, circle):
+        if self.__canvas:
+            self.__canvas.remove_item(circle)
+        else:
+            circle.setParent(None)
+            circle.deleteLater()
+
+    def __setup_target(self, target, diameter):
         target.set_diameter(diameter)
         target.set_target(True)
         target_pos = self.__model.get_target_position()
         target.move(target_pos[0], target_pos[1])
-        target.clicked.connect(self.__circle_clicked)
         self.__circles.append(target)
 
         return target
 
     def __create_circles(self, count, diameter):
-        max_x = self.width() - diameter
-        max_y = self.height() - diameter
-
-        # One-time determination of the position of the targets, which are then saved in config file
-        # for i in range(0, 5):
-        # print(str(self.get_random_pos(max_x, max_y)))
+        pooled_circles = self.__circle_pool.acquire(count)
 
-        target = self.__create_target(diameter)
-        self.__pointing_technique = PointingTechnique(target, self.__model.get_threshold(), self.__model.get_density())
+        target = self.__setup_target(pooled_circles[0], diameter)
+        if self.__pointing_technique_class:
+            self.__pointing_technique = self.__pointing_technique_class(target, self.__model.get_threshold(),
+                                                                        self.__model.get_density(),
+                                                                        self.__pointer_device)
 
-        for i in range(0, count - 1):
-            (x, y) = self.get_random_pos(max_x, max_y)
+        positions = self.__model.get_distractor_positions()
+        if positions is None:
+            positions = self.__layout.create_positions(count - 1, diameter, self.__model.get_target_position())
 
-            circle = CircleWidget(self)
+        for circle, (x, y) in zip(pooled_circles[1:], positions):
+            circle.set_target(False)
             circle.set_diameter(diameter)
             circle.move(x, y)
 
-            while self.__has_collision(circle):
-                (x, y) = self.get_random_pos(max_x, max_y)
-                circle.move(x, y)
-
-            circle.clicked.connect(self.__circle_clicked)
             self.__circles.append(circle)
 
-    def __has_collision(self, new_circle):
+    def __finish(self):
+        self.__is_finished = True
+        self.__telemetry.end_trial()
+        self.__model.close()
+        self.__close_pointer_device()
+
+    def __close_pointer_device(self):
+        self.__cancel_pointing_technique()
+
+        if self.__technique_pipeline:
+            self.__technique_pipeline.stop()
+
+        if self.__pointer_device:
+            self.__pointer_device.close()
+
+    def __handle_result_error(self, message):
+        # the results of all following trials would be lost, so the experiment is stopped
+        sys.stderr.write("The results could not be written: {0}\n".format(message))
+        if not self.__is_finished:
+            if not self.__headless:
+                QtWidgets.QMessageBox.critical(self, self.windowTitle(),
+                                               "The results could not be written:\n{0}".format(message))
+            # finishes the experiment, see closeEvent
+            self.close()
+
+    def is_finished(self):
+        return self.__is_finished
+
+    def get_start_rect(self):
+        return self.__mouse_target.geometry()
+
+    def get_target_rect(self):
+        # None if no trial is running
         for circle in self.__circles:
-            if new_circle.geometry().intersects(circle.geometry()):
-                return True
+            if circle.is_target():
+                return circle.geometry()
+
+        return None
+
+    def setup_trial(self):
+        # starts the current trial as if the start circle was clicked at the cursor position, e.g. for benchmarks
+        self.__setup_circles()
+
+    def clear_trial(self):
+        # ends the current trial without a click on the target and selects the next one
+        self.__clear_screen()
+
+    def get_distraction_engine(self):
+        return self.__distraction_engine
+
+    def __start_recording(self):
+        if self.__trajectory_recorder:
+            self.__trajectory_recorder.clear()
+            self.__is_recording = True
+
+    def __stop_recording(self):
+        if self.__is_recording:
+            self.__is_recording = False
+            self.__trajectory_recorder.flush_trial(self.__model.get_condition_id(), self.__model.get_trial_index())
 
-        return False
+    def __cancel_pointing_technique(self):
+        if self.__pointing_technique:
+            self.__pointing_technique.cancel()
 
     def mouseMoveEvent(self, event):
-        if self.__pointing_technique and self.__model.get_pointer() == "novel":
-            self.__pointing_technique.filter(event.pos())
+        self.__telemetry.record_input(event.timestamp())
+
+        if self.__is_recording or self.__technique_pipeline:
+            t_ns = self.__model.get_input_clock().map_event_timestamp_ns(event.timestamp())
+
+            if self.__is_recording:
+                self.__trajectory_recorder.record(t_ns, event.x(), event.y(), int(event.buttons()))
+
+            # the time of the latest position, which is the one the coalescer passes on
+            self.__last_move_ns = t_ns
+
+        # the techniques get the latest position at their sample rate instead of every event
+        self.__move_coalescer.submit(event.pos())
+
+    def __filter_pointing_technique(self, position):
+        if self.__pointing_technique:
+            self.__pointing_technique.filter(position)
+
+    def __submit_to_technique_pipeline(self, position):
+        self.__technique_pipeline.submit(position.x(), position.y(), self.__last_move_ns)
+
+    def closeEvent(self, event):
+        self.__finish()
+        super(MainWindow, self).closeEvent(event)
 
     def mousePressEvent(self, event):
         # is only called when background is clicked
         if event.button() == QtCore.Qt.LeftButton:
-            self.__model.handle_false_clicked(event.pos())
+            selected_circle = self.__get_selected_circle()
+            if selected_circle:
+                self.__handle_circle_clicked(event.globalPos(), selected_circle, event.timestamp())
+                return
+
+            self.__cancel_pointing_technique()
+            self.__telemetry.record_input(event.timestamp())
+            self.__report_trial_statistics()
+            self.__model.handle_false_clicked(event.pos(), event.timestamp())
+
+
+class StartupTiming:
+
+    def __init__(self):
+        self.__phases = [("interpreter and imports (cpu)", time.process_time() * 1000)]
+        self.__phase_start = time.perf_counter()
+
+    def end_phase(self, name):
+        now = time.perf_counter()
+        self.__phases.append((name, (now - self.__phase_start) * 1000))
+        self.__phase_start = now
+
+    def report(self):
+        for name, duration in self.__phases:
+            sys.stderr.write("{0}: {1:.1f} ms\n".format(name, duration))
+
+        sys.stderr.write("total: {0:.1f} ms\n".format(sum(duration for _, duration in self.__phases)))
 
 
 if __name__ == '__main__':
-    test_config = ConfigParsing()
+    startup_timing = StartupTiming() if os.environ.get("POINTING_EXPERIMENT_STARTUP_TIMING") else None
+
+    # a session of a study plan is selected with its session id as second argument (see study_plan.py)
+    test_config = ConfigParsing(session_id=sys.argv[2] if len(sys.argv) > 2 else None)
+    if startup_timing:
+        startup_timing.end_phase("config")
+
+    if test_config.get_config().get(ConfigKeys.TRAJECTORY_DIRECTORY.value):
+        # Qt merges consecutive mouse move events into one, the trajectory would only contain the merged positions.
+        # The attribute has to be set before the QApplication is created.
+        QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_CompressHighFrequencyEvents, False)
 
     app = QtWidgets.QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(True)
+    if startup_timing:
+        startup_timing.end_phase("qt application")
+
+    # the intro dialog would wait for the user, so it is not shown when the startup is measured
+    trial = MainWindow(test_config.get_config(), headless=startup_timing is not None)
+    if startup_timing:
+        startup_timing.end_phase("main window")
 
-    trial = MainWindow(test_config.get_config())
     trial.show()
 
+    if startup_timing:
+        def on_first_frame():
+            startup_timing.end_phase("first frame")
+            startup_timing.report()
+            trial.close()
+
+        # the timer is called after the first frame has been painted
+        QtCore.QTimer.singleShot(0, on_first_frame)
+
     sys.exit(app.exec_())
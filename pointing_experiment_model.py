@@ -1,10 +1,14 @@
 import math
 import random
-import sys
+import socket
 from datetime import datetime
 from enum import Enum
 
-from PyQt5.QtCore import QObject
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from input_clock import InputClock
+from result_writer import ResultWriter, TeeSink
+from session_journal import SessionJournal
 
 
 # Main author: Claudia
@@ -22,13 +26,41 @@ class ConfigKeys(Enum):
     DISTRACTION = "distraction"
     CONDITIONS = "conditions"
     TARGET_POSITIONS = "target_positions"
+    RENDERER = "renderer"
+    LAYOUT_SEED = "layout_seed"
+    SESSION_PLAN = "session_plan"
+    RESULT_SINK = "result_sink"
+    RESULT_FILE = "result_file"
+    RESULT_DURABILITY = "result_durability"
+    TRAJECTORY_DIRECTORY = "trajectory_directory"
+    COLUMNAR_DIRECTORY = "columnar_directory"
+    TECHNIQUES = "techniques"
+    JOURNAL_FILE = "journal_file"
+    COLLECTOR_ADDRESS = "collector_address"
+    STATION = "station"
 
     @staticmethod
     def get_all_values():
         return list(map(lambda v: v.value, ConfigKeys))
 
+    @staticmethod
+    def get_optional_values():
+        # keys which do not have to be in the config file, default values are used instead
+        return [ConfigKeys.RENDERER.value, ConfigKeys.LAYOUT_SEED.value, ConfigKeys.SESSION_PLAN.value,
+                ConfigKeys.RESULT_SINK.value, ConfigKeys.RESULT_FILE.value, ConfigKeys.RESULT_DURABILITY.value,
+                ConfigKeys.TRAJECTORY_DIRECTORY.value, ConfigKeys.COLUMNAR_DIRECTORY.value, ConfigKeys.TECHNIQUES.value,
+                ConfigKeys.JOURNAL_FILE.value, ConfigKeys.COLLECTOR_ADDRESS.value, ConfigKeys.STATION.value]
+
+
+class SessionPlanKeys(Enum):
+    TARGET_POSITION = "target_position"
+    CIRCLE_POSITIONS = "circle_positions"
+
 
 class PointingExperimentModel(QObject):
+    # emitted by the background thread of the ResultWriter if the results can not be written anymore
+    result_error = pyqtSignal(str)
+
     # remaining csv column names
     CONDITION = "condition"
     MOUSE_START_POSITION_X = "mouse_start_x_position"
@@ -42,30 +74,83 @@ class PointingExperimentModel(QObject):
 
     TASK_COMPLETION_TIME = "task_completion_time_in_ms"
     TIMESTAMP = "timestamp"
-
-    # remaining constant
+    HANDLER_TASK_COMPLETION_TIME = "handler_task_completion_time_in_ms"
+    # relative to the fastest event handled so far (see input_clock.py): the first event of a session always has a
+    # delay of 0 and the delays of the first trials are too small until a fast event was seen
+    INPUT_TO_HANDLER_DELAY = "input_to_handler_delay_in_ms"
+    DROPPED_DISTRACTION_FRAMES = "dropped_distraction_frames"
+    LATE_DISTRACTION_FRAMES = "late_distraction_frames"
+    TECHNIQUE_OVERRUNS = "technique_overruns"
+    TECHNIQUE_MAX_LATENCY = "technique_max_latency_in_ms"
+    # per trial summary of the telemetry (see telemetry.py)
+    INPUT_DELAY_P50 = "input_delay_p50_in_ms"
+    INPUT_DELAY_P99 = "input_delay_p99_in_ms"
+    PAINT_INTERVAL_P99 = "paint_interval_p99_in_ms"
+    MAX_STALL = "max_stall_in_ms"
+    STALL_COUNT = "stall_count"
+    # centre of the target in window coordinates, like the start and click positions
+    TARGET_CENTER_X = "target_center_x_position"
+    TARGET_CENTER_Y = "target_center_y_position"
+    TECHNIQUE_STALL_TIME = "technique_stall_time_in_ms"
+    # coordinate system of the click position: the sessions of the first studies stored the clicks on the circles in
+    # screen coordinates (FRAME_SCREEN), newer sessions store all positions in window coordinates (FRAME_WINDOW)
+    CLICK_POSITION_FRAME = "click_position_frame"
+    DROPPED_TRAJECTORY_SAMPLES = "dropped_trajectory_samples"
+
+    # csv columns in the order of the csv file and the types of their values (see columnar_store.py)
+    COLUMN_TYPES = {
+        ConfigKeys.PARTICIPANT_ID.value: "int",
+        CONDITION: "int",
+        ConfigKeys.POINTER_TYPE.value: "str",
+        MOUSE_START_POSITION_X: "int",
+        MOUSE_START_POSITION_Y: "int",
+        MOUSE_CLICKED_POSITION_X: "int",
+        MOUSE_CLICKED_POSITION_Y: "int",
+        DISTANCE_TO_START_POSITION: "float",
+        ConfigKeys.CIRCLE_COUNT.value: "int",
+        ConfigKeys.CIRCLE_SIZE.value: "int",
+        CIRCLE_CLICKED: "bool",
+        IS_TARGET: "bool",
+        TASK_COMPLETION_TIME: "float",
+        TIMESTAMP: "datetime",
+        HANDLER_TASK_COMPLETION_TIME: "float",
+        INPUT_TO_HANDLER_DELAY: "float",
+        # float, so sessions without these columns can be stored with NaN (see ingest_sessions.py)
+        DROPPED_DISTRACTION_FRAMES: "float",
+        LATE_DISTRACTION_FRAMES: "float",
+        TECHNIQUE_OVERRUNS: "float",
+        TECHNIQUE_MAX_LATENCY: "float",
+        INPUT_DELAY_P50: "float",
+        INPUT_DELAY_P99: "float",
+        PAINT_INTERVAL_P99: "float",
+        MAX_STALL: "float",
+        STALL_COUNT: "float",
+        TARGET_CENTER_X: "float",
+        TARGET_CENTER_Y: "float",
+        TECHNIQUE_STALL_TIME: "float",
+        CLICK_POSITION_FRAME: "str",
+        DROPPED_TRAJECTORY_SAMPLES: "float"
+    }
+
+    TELEMETRY_COLUMNS = [INPUT_DELAY_P50, INPUT_DELAY_P99, PAINT_INTERVAL_P99, MAX_STALL, STALL_COUNT]
+
+    # remaining constants
     INVALID_TIME = "NaN"
 
-    @staticmethod
-    def __write_to_stdout_in_csv_format(row_data):
-        row_data_values = list(row_data.values())
-        values_length = len(row_data_values)
+    FRAME_WINDOW = "window"
+    FRAME_SCREEN = "screen"
 
-        for i in range(values_length):
-            value = str(row_data_values[i])
+    WINDOW_WIDTH = 800
+    WINDOW_HEIGHT = 600
 
-            if i == values_length - 1:
-                sys.stdout.write(value)
-            else:
-                sys.stdout.write(value + ",")
+    RENDERER_WIDGET = "widget"
+    RENDERER_CANVAS = "canvas"
 
-        sys.stdout.write("\n")
-        sys.stdout.flush()
-
-    def __init__(self, config):
+    def __init__(self, config, input_clock=None):
         super().__init__()
 
         self.config = config
+        self.__input_clock = input_clock if input_clock else InputClock()
 
         conditions = self.config[ConfigKeys.CONDITIONS.value]
 
@@ -76,40 +161,154 @@ class PointingExperimentModel(QObject):
         self.__start_time = self.INVALID_TIME
         self.__end_time = self.INVALID_TIME
 
-        self.__setup_target_positions()
-        self.__stdout_csv_column_names()
+        self.__dropped_distraction_frames = 0
+        self.__late_distraction_frames = 0
+        self.__technique_overruns = 0
+        self.__technique_max_latency = 0.0
+        self.__technique_stall_time = 0.0
+        self.__dropped_trajectory_samples = 0
+        self.__telemetry_summary = {column: self.INVALID_TIME for column in self.TELEMETRY_COLUMNS}
+
+        # (circle count, circle size, target position) of the trials which were completed before the session resumed
+        self.__resumed_trials = []
+        self.__is_session_completed = False
+
+        self.__collector_sink = None
+        self.__journal = None
+        self.__random = random.Random()
+        journal_file = self.config.get(ConfigKeys.JOURNAL_FILE.value)
+        if journal_file:
+            self.__journal = SessionJournal(journal_file)
+            records = self.__journal.get_records()
+            self.__random.seed(self.__restore_seed(records))
+            self.__setup_target_positions()
+            completed_rows = self.__restore_position(records)
+        else:
+            self.__setup_target_positions()
+            completed_rows = []
+
+        # the first error of the result writer, None if all rows were written
+        self.__result_error = None
+        self.__result_writer = self.__create_result_writer()
+
+        # the rows of the completed trials are written again, as all sinks are created empty
+        for values in completed_rows:
+            self.__write_values(values)
+
+    def __get_condition_index(self):
+        return self.config[ConfigKeys.CONDITIONS.value].index(self.__condition)
+
+    def __get_planned_trials(self):
+        # precompiled session plan (see session_plan.py), contains one list of trials per condition
+        return self.config[ConfigKeys.SESSION_PLAN.value][self.__get_condition_index()]
+
+    def __has_session_plan(self):
+        return ConfigKeys.SESSION_PLAN.value in self.config
 
     def __setup_target_positions(self):
-        self.__target_positions = self.config[ConfigKeys.TARGET_POSITIONS.value]
-        random.shuffle(self.__target_positions)
+        if self.__has_session_plan():
+            self.__target_positions = [trial[SessionPlanKeys.TARGET_POSITION.value]
+                                       for trial in self.__get_planned_trials()]
+            return
+
+        self.__target_positions = list(self.config[ConfigKeys.TARGET_POSITIONS.value])
+        self.__random.shuffle(self.__target_positions)
+
+    def __get_condition_ids(self):
+        return [condition["id"] for condition in self.config[ConfigKeys.CONDITIONS.value]]
+
+    def __restore_seed(self, records):
+        # the seed of the shuffled target positions, a new session gets a new seed
+        if not records:
+            seed = random.randrange(2 ** 32)
+            self.__journal.append({"type": SessionJournal.SESSION, "seed": seed,
+                                   ConfigKeys.PARTICIPANT_ID.value: self.get_participant_id(),
+                                   ConfigKeys.CONDITIONS.value: self.__get_condition_ids()})
+            return seed
+
+        session = records[0]
+        if session.get("type") != SessionJournal.SESSION \
+                or session.get(ConfigKeys.PARTICIPANT_ID.value) != self.get_participant_id() \
+                or session.get(ConfigKeys.CONDITIONS.value) != self.__get_condition_ids():
+            raise ValueError("the journal {0} belongs to another session".format(
+                self.config[ConfigKeys.JOURNAL_FILE.value]))
+
+        return session["seed"]
+
+    def __restore_position(self, records):
+        """Skips the completed trials of the journal and returns the values of their rows."""
+        rows = {}
+        completed_rows = []
+
+        for record in records[1:]:
+            position = (record.get("condition"), record.get("trial"))
+
+            if record["type"] == SessionJournal.ROW:
+                rows.setdefault(position, []).append(record["values"])
+
+            elif record["type"] == SessionJournal.RESUME:
+                # the trial which was interrupted is repeated, so its rows are left out
+                rows.clear()
+
+            elif record["type"] == SessionJournal.TRIAL:
+                if position != (self.__get_condition_index(), self.__target_position_index):
+                    raise ValueError("the journal {0} does not match the conditions of the session".format(
+                        self.config[ConfigKeys.JOURNAL_FILE.value]))
+
+                self.__resumed_trials.append((self.get_circle_count(), self.get_circle_size(),
+                                              self.get_target_position()))
+                completed_rows += rows.pop(position, [])
+
+                if not self.__advance():
+                    self.__is_session_completed = True
+
+        if records:
+            self.__journal.append({"type": SessionJournal.RESUME})
+
+        return completed_rows
 
     def __get_csv_columns(self):
-        return [
-            ConfigKeys.PARTICIPANT_ID.value,
-            self.CONDITION,
-            ConfigKeys.POINTER_TYPE.value,
-            self.MOUSE_START_POSITION_X,
-            self.MOUSE_START_POSITION_Y,
-            self.MOUSE_CLICKED_POSITION_X,
-            self.MOUSE_CLICKED_POSITION_Y,
-            self.DISTANCE_TO_START_POSITION,
-            ConfigKeys.CIRCLE_COUNT.value,
-            ConfigKeys.CIRCLE_SIZE.value,
-            self.CIRCLE_CLICKED,
-            self.IS_TARGET,
-            self.TASK_COMPLETION_TIME,
-            self.TIMESTAMP
-        ]
-
-    def __stdout_csv_column_names(self):
-        for column_name in self.__get_csv_columns():
-            if column_name == self.__get_csv_columns()[-1]:
-                sys.stdout.write(str(column_name))
-            else:
-                sys.stdout.write(str(column_name) + ",")
-
-        sys.stdout.write("\n")
-        sys.stdout.flush()
+        return list(self.COLUMN_TYPES)
+
+    def __create_result_writer(self):
+        # by default the results are written to stdout
+        sink = ResultWriter.create_sink(self.config.get(ConfigKeys.RESULT_SINK.value, ResultWriter.SINK_STDOUT),
+                                        self.config.get(ConfigKeys.RESULT_FILE.value))
+        durability = self.config.get(ConfigKeys.RESULT_DURABILITY.value, ResultWriter.DURABILITY_BOUNDED_LOSS)
+
+        columnar_directory = self.config.get(ConfigKeys.COLUMNAR_DIRECTORY.value)
+        if columnar_directory:
+            # numpy is only needed if the results are also written in columnar format
+            from columnar_store import ColumnarSink
+            sink = TeeSink([sink, ColumnarSink(columnar_directory, self.COLUMN_TYPES.items())])
+
+        collector_address = self.config.get(ConfigKeys.COLLECTOR_ADDRESS.value)
+        if collector_address:
+            # the results are also sent to a ResultCollector (see result_collector.py)
+            from result_collector import CollectorSink, parse_address
+            self.__collector_sink = CollectorSink(parse_address(collector_address),
+                                                  self.config.get(ConfigKeys.STATION.value, socket.gethostname()))
+            sink = TeeSink([sink, self.__collector_sink])
+
+        return ResultWriter(sink, self.__get_csv_columns(), durability,
+                            error_callback=lambda error: self.result_error.emit(str(error)))
+
+    def __write_values(self, values):
+        # in strict mode write_row raises the errors of the sink on the GUI thread, they are reported the same way as
+        # the errors of the background thread instead of being raised inside of a Qt slot
+        try:
+            self.__result_writer.write_row(values)
+        except Exception as error:
+            self.__result_error = str(error)
+            self.result_error.emit(self.__result_error)
+
+    def __write_row(self, row_data):
+        values = list(row_data.values())
+        self.__write_values(values)
+
+        if self.__journal:
+            self.__journal.append({"type": SessionJournal.ROW, "condition": self.__get_condition_index(),
+                                   "trial": self.__target_position_index, "values": values})
 
     def __calculate_distance_to_start_position(self, mouse_position):
         return math.hypot(
@@ -117,15 +316,18 @@ class PointingExperimentModel(QObject):
             mouse_position.y() - self.__mouse_start_position.y()
         )
 
-    def __calculate_task_time(self):
-        try:
-            return (self.__end_time - self.__start_time).total_seconds() * 1000
-        except AttributeError:
-            return self.INVALID_TIME
-        except TypeError:
+    def __calculate_task_time(self, use_handler_time=False):
+        if self.__start_time == self.INVALID_TIME or self.__end_time == self.INVALID_TIME:
             return self.INVALID_TIME
 
-    def __create_row_data(self, mouse_position, circle_clicked=False, is_target=False):
+        # by default the times of the clicks themselves are used instead of the times they were handled,
+        # both times of a trial are always taken from the same time base
+        if use_handler_time:
+            return (self.__end_time.handler_ns - self.__start_time.handler_ns) / 1000000
+
+        return (self.__end_time.input_ns - self.__start_time.input_ns) / 1000000
+
+    def __create_row_data(self, mouse_position, input_time, circle_clicked=False, is_target=False):
         return {
             ConfigKeys.PARTICIPANT_ID.value: self.get_participant_id(),
             self.CONDITION: self.__condition["id"],
@@ -140,12 +342,48 @@ class PointingExperimentModel(QObject):
             self.CIRCLE_CLICKED: circle_clicked,
             self.IS_TARGET: is_target,
             self.TASK_COMPLETION_TIME: self.__calculate_task_time(),
-            self.TIMESTAMP: datetime.now()
+            self.TIMESTAMP: datetime.now(),
+            self.HANDLER_TASK_COMPLETION_TIME: self.__calculate_task_time(use_handler_time=True),
+            self.INPUT_TO_HANDLER_DELAY: input_time.get_delay_in_ms(),
+            self.DROPPED_DISTRACTION_FRAMES: self.__dropped_distraction_frames,
+            self.LATE_DISTRACTION_FRAMES: self.__late_distraction_frames,
+            self.TECHNIQUE_OVERRUNS: self.__technique_overruns,
+            self.TECHNIQUE_MAX_LATENCY: self.__technique_max_latency,
+            **self.__telemetry_summary,
+            self.TARGET_CENTER_X: self.get_target_position()[0] + self.get_circle_size() / 2,
+            self.TARGET_CENTER_Y: self.get_target_position()[1] + self.get_circle_size() / 2,
+            self.TECHNIQUE_STALL_TIME: self.__technique_stall_time,
+            self.CLICK_POSITION_FRAME: self.FRAME_WINDOW,
+            self.DROPPED_TRAJECTORY_SAMPLES: self.__dropped_trajectory_samples
         }
 
     def set_mouse_start_position(self, position):
         self.__mouse_start_position = position
 
+    def set_distraction_frames(self, dropped_frames, late_frames):
+        # dropped and late frames of the distraction in the current trial (see distraction.py)
+        self.__dropped_distraction_frames = dropped_frames
+        self.__late_distraction_frames = late_frames
+
+    def set_technique_statistics(self, overruns, max_latency):
+        # batches of the technique pipeline in the current trial which exceeded the latency budget and the longest
+        # time in ms in which a batch was processed
+        self.__technique_overruns = overruns
+        self.__technique_max_latency = max_latency
+
+    def set_technique_stall_time(self, stall_time):
+        # time in ms in which the interpolation steps of the PointingTechnique blocked the event loop in the current
+        # trial
+        self.__technique_stall_time = stall_time
+
+    def set_dropped_trajectory_samples(self, dropped_samples):
+        # samples of the current trial which were overwritten in the ring buffer of the TrajectoryRecorder
+        self.__dropped_trajectory_samples = dropped_samples
+
+    def set_telemetry_summary(self, summary):
+        # values of the TELEMETRY_COLUMNS in the current trial
+        self.__telemetry_summary = {column: summary[column] for column in self.TELEMETRY_COLUMNS}
+
     def get_participant_id(self):
         return self.config[ConfigKeys.PARTICIPANT_ID.value]
 
@@ -161,6 +399,30 @@ class PointingExperimentModel(QObject):
     def get_target_position(self):
         return self.__target_positions[self.__target_position_index]
 
+    def get_distractor_positions(self):
+        # None if the layout has to be created at runtime
+        if not self.__has_session_plan():
+            return None
+
+        return self.__get_planned_trials()[self.__target_position_index][SessionPlanKeys.CIRCLE_POSITIONS.value]
+
+    def get_condition_id(self):
+        return self.__condition["id"]
+
+    def get_trial_index(self):
+        return self.__target_position_index
+
+    def get_input_clock(self):
+        return self.__input_clock
+
+    def get_collector_sink(self):
+        # None if the results are not sent to a collector
+        return self.__collector_sink
+
+    def get_trajectory_directory(self):
+        # None if no trajectories are recorded
+        return self.config.get(ConfigKeys.TRAJECTORY_DIRECTORY.value)
+
     def get_circle_size(self):
         return self.__condition[ConfigKeys.CIRCLE_SIZE.value]
 
@@ -179,12 +441,39 @@ class PointingExperimentModel(QObject):
     def get_density(self):
         return self.config[ConfigKeys.DENSITY.value]
 
+    def get_renderer(self):
+        return self.config.get(ConfigKeys.RENDERER.value, self.RENDERER_WIDGET)
+
+    def get_techniques(self):
+        # names of the stages of the technique pipeline (see technique_pipeline.py), None for PointingTechnique
+        return self.config.get(ConfigKeys.TECHNIQUES.value)
+
+    def get_layout_seed(self):
+        # None means that the layouts are not reproducible
+        return self.config.get(ConfigKeys.LAYOUT_SEED.value)
+
+    def get_result_error(self):
+        return self.__result_error
+
+    def get_resumed_trials(self):
+        return self.__resumed_trials
+
+    def is_session_completed(self):
+        # True if all trials were already completed before the session was resumed
+        return self.__is_session_completed
+
     def select_next_target(self):
+        if self.__journal:
+            self.__journal.append({"type": SessionJournal.TRIAL, "condition": self.__get_condition_index(),
+                                   "trial": self.__target_position_index})
+
+        return self.__advance()
+
+    def __advance(self):
         self.__target_position_index += 1
 
         if not (self.__target_position_index < len(self.__target_positions)):
             self.__target_position_index = 0
-            random.shuffle(self.__target_positions)
 
             conditions = self.config[ConfigKeys.CONDITIONS.value]
             index = conditions.index(self.__condition) + 1
@@ -193,25 +482,38 @@ class PointingExperimentModel(QObject):
                 return False
 
             self.__condition = conditions[index]
+            self.__setup_target_positions()
 
         return True
 
-    def handle_false_clicked(self, mouse_position):
-        self.__write_to_stdout_in_csv_format(self.__create_row_data(mouse_position))
+    def handle_false_clicked(self, mouse_position, event_timestamp=None):
+        # event_timestamp is the timestamp of the QMouseEvent in ms
+        input_time = self.__input_clock.map_event_timestamp(event_timestamp)
+        self.__write_row(self.__create_row_data(mouse_position, input_time))
+
+    def handle_circle_clicked(self, mouse_position, is_target, event_timestamp=None):
+        input_time = self.__input_clock.map_event_timestamp(event_timestamp)
 
-    def handle_circle_clicked(self, mouse_position, is_target):
         if is_target:
-            self.__end_time = datetime.now()
-            self.__write_to_stdout_in_csv_format(
-                self.__create_row_data(mouse_position, circle_clicked=True, is_target=is_target))
+            self.__end_time = input_time
+            self.__write_row(self.__create_row_data(mouse_position, input_time, circle_clicked=True,
+                                                    is_target=is_target))
 
             self.__start_time = self.INVALID_TIME
             self.__end_time = self.INVALID_TIME
 
         else:
             self.__end_time = self.INVALID_TIME
-            self.__write_to_stdout_in_csv_format(self.__create_row_data(mouse_position, circle_clicked=True))
+            self.__write_row(self.__create_row_data(mouse_position, input_time, circle_clicked=True))
+
+    def close(self):
+        # writes all remaining rows
+        self.__result_writer.close()
+
+        if self.__journal:
+            self.__journal.close()
 
-    def start_timer(self):
+    def start_timer(self, event_timestamp=None):
+        # event_timestamp is the timestamp of the click on the start circle in ms
         if self.__start_time == self.INVALID_TIME:
-            self.__start_time = datetime.now()
+            self.__start_time = self.__input_clock.map_event_timestamp(event_timestamp)
@@ -1,8 +1,7 @@
 import math
 import time
 
-from PyQt5 import QtWidgets
-from evdev import UInput, ecodes as e
+from PyQt5 import QtCore
 
 """
 Our pointing technique supports users by moving the cursor to the target when it is near the target.
@@ -11,26 +10,33 @@ The following sources have been consulted for the implementation:
     - https://en.wikipedia.org/wiki/Linear_interpolation
     - https://stackoverflow.com/questions/49173095/how-to-move-an-object-along-a-line-given-two-points#49173439
 
-Upon initialization of the method, the target, a threshold value at which the indentation should start
-and the number of interpolation steps are transmitted.
+Upon initialization of the method, the target, a threshold value at which the indentation should start,
+the number of interpolation steps and the virtual pointer device are transmitted.
 For positioning the mouse UInput was used (see https://python-evdev.readthedocs.io/en/latest/usage.html and
-https://www.kernel.org/doc/html/v4.12/input/uinput.html).
+https://www.kernel.org/doc/html/v4.12/input/uinput.html). The device is shared by all trials of a session
+(see virtual_pointer_device.py).
 
 The new pointing technique is executed when it is enabled in the config file and the mouse is moved.
 The filter method used for this gets the current position of the mouse and moves the pointer to the
 target once the distance to the target is below the threshold.
 
-As the user clicks at the target, the device closes to prevent the cursor from moving.
+As the user clicks, the movement is stopped to prevent the cursor from moving.
+
+The interpolation steps are driven by a QTimer, so the event loop is never blocked while the cursor is moved.
+The movement is cancelled as soon as the user clicks (see cancel) or moves the mouse away from the target.
+The threshold distance is computed once per trial, and filter only gets the latest mouse position every
+sample_interval ms (see input_coalescer.py), as the movement runs in steps of step_interval ms anyway.
+The time spent in the interpolation steps, i.e. the time in which the event loop could not handle other events,
+is summed up per trial and written to the results (technique_stall_time_in_ms).
 """
 
 
 # Author: Sarah
 # Reviewer: Claudia
 class PointingTechnique:
-    capabilities = {
-        e.EV_REL: (e.REL_X, e.REL_Y),
-        e.EV_KEY: (e.BTN_LEFT, e.BTN_RIGHT)
-    }
+    step_interval = 10  # ms between two interpolation steps
+    sample_interval = 8  # ms between two mouse positions passed to filter
+    cancel_tolerance = 2  # px the user can move away from the target without cancelling the movement
 
     def __get_distance_to_target(self, pos):
         return math.dist([pos.x(), pos.y()], [self.__target_pos.x(), self.__target_pos.y()])
@@ -47,49 +53,93 @@ class PointingTechnique:
 
         self.__moving = True
 
+        self.__step = 0
+        self.__start_pos = (self.__current_pos.x(), self.__current_pos.y())
+        self.__last_pos = self.__start_pos
+        self.__last_distance = self.__get_distance_to_target(self.__current_pos)
+
+        self.__timer.start()
+        self.__on_step()
+
+    def __on_step(self):
+        step_start = time.perf_counter()
+
         n = self.__density  # The smaller n is the "faster" the mouse becomes
-        x0, y0 = self.__current_pos.x(), self.__current_pos.y()
-        x1, y1 = self.__target_pos.x(), self.__target_pos.y()
-        x_t0, y_t0 = x0, y0
+        if self.__step >= n or self.__is_in_target(self.__current_pos):
+            self.__stop()
+            return
 
-        for i in range(0, n):
-            if self.__is_in_target(self.__current_pos):
-                return
+        x0, y0 = self.__start_pos
+        x1, y1 = self.__target_pos.x(), self.__target_pos.y()
+        x_t0, y_t0 = self.__last_pos
 
-            t = i / n
-            x_t = (1.0 - t) * x0 + t * x1
-            y_t = (1.0 - t) * y0 + t * y1
+        t = self.__step / n
+        x_t = (1.0 - t) * x0 + t * x1
+        y_t = (1.0 - t) * y0 + t * y1
 
-            rel_x = int(x_t - x_t0)
-            rel_y = int(y_t - y_t0)
+        rel_x = int(x_t - x_t0)
+        rel_y = int(y_t - y_t0)
 
-            self.__device.write(e.EV_REL, e.REL_X, rel_x)
-            self.__device.write(e.EV_REL, e.REL_Y, rel_y)
-            self.__device.syn()
+        self.__device.move(rel_x, rel_y)
+        self.__device.flush()
 
-            x_t0, y_t0 = x_t, y_t
+        self.__last_pos = (x_t, y_t)
+        self.__step += 1
 
-            time.sleep(0.01)
-            QtWidgets.qApp.processEvents()
+        self.__stall_time += time.perf_counter() - step_start
 
+    def __stop(self):
+        self.__timer.stop()
+        self.__device.discard()
         self.__moving = False
 
-    def __init__(self, target, threshold, density):
+    def __init__(self, target, threshold, density, device, timer=None):
         self.__moving = False
-        self.__device = UInput(self.capabilities)
+        self.__cancelled = False
+        self.__step = 0
+        self.__start_pos = None
+        self.__last_pos = None
+        self.__last_distance = 0
+        self.__stall_time = 0.0
+
+        # a different timer can be passed, e.g. to replay recorded movements in simulated time (see trace_replay.py)
+        self.__timer = timer if timer else QtCore.QTimer()
+        self.__timer.setInterval(self.step_interval)
+        self.__timer.timeout.connect(self.__on_step)
+
+        self.__device = device
         self.__target = target
         self.__target_pos = self.__target.geometry().center()
         self.__current_pos = None
 
-        self.__threshold = threshold
+        # the size of the window does not change during a trial
+        self.__threshold_distance = int(self.__target.parent().width() * threshold)
         self.__density = density
 
-    def __del__(self):
-        self.__device.close()
+    def cancel(self):
+        # the cursor is not moved again until the user has left the threshold area
+        self.__cancelled = True
+
+        if self.__moving:
+            self.__stop()
+
+    def get_stall_time_in_ms(self):
+        return self.__stall_time * 1000
 
     def filter(self, current_pos):
         self.__current_pos = current_pos
 
-        threshold = int(self.__target.parent().width() * self.__threshold)
-        if self.__get_distance_to_target(current_pos) < threshold:
+        if self.__moving:
+            # the user moves away from the target
+            distance = self.__get_distance_to_target(current_pos)
+            if distance > self.__last_distance + self.cancel_tolerance:
+                self.cancel()
+                return
+
+            self.__last_distance = min(distance, self.__last_distance)
+            return
+
+        if self.__get_distance_to_target(current_pos) >= self.__threshold_distance:
+            self.__cancelled = False
+        elif not self.__cancelled:
             self.__move_to_target()
@@ -0,0 +1,516 @@
+#!/usr/bin/python3
+
+import base64
+import collections
+import json
+import os
+import queue
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel
+
+"""
+Collects the results of several stations (lab machines) which run sessions at the same time:
+    python3 result_collector.py <output columnar directory> [port] [host]
+
+The ResultCollector is a TCP server (by default on localhost). Every station sends its result rows and, optionally,
+its trajectories (see trajectory_recorder.py) with a CollectorSink, which is used by the PointingExperimentModel if
+"collector_address" ("<host>:<port>") is set in the config file. The rows of all stations are merged into one typed
+columnar dataset (see columnar_store.py) with the additional column "station" as soon as they arrive. The file
+index.json of the dataset contains the row ranges and the trajectories of every station, so the rows of a station
+can be found without reading the station column. Trajectories are stored as
+<output directory>/trajectories/<station>/<name>.trajectory.
+
+Protocol: every message is one JSON object per line (NDJSON). A station starts every connection with
+{"type": "hello", "station": ..., "run": ..., "columns": [...]}, followed by batches
+{"type": "rows", "batch": n, "rows": [[...], ...]} and {"type": "trajectory", "batch": n, "name": ..., "data": ...},
+and the collector acknowledges every batch with {"ack": n} once it has been flushed.
+
+The CollectorSink sends the batches in a background thread, so neither the GUI nor the ResultWriter waits for the
+network. At most window batches are sent without acknowledgement; if the collector is slower, the batches wait in the
+sink (back-pressure) instead of filling the buffers of the socket. If the connection is lost, the sink reconnects
+with exponential backoff and sends all batches which were not acknowledged again. The collector ignores batches it
+has already received from the same run of a station, and rows it has already stored: a resumed session (see
+session_journal.py) sends the rows of its completed trials again, with their original timestamps. A row is
+identified by the station, the participant, the condition and its timestamp. The rows of an interrupted trial which
+reached the collector before the session was resumed are kept, like all other clicks.
+
+If the collector is started again with the same output directory, the rows are appended to the existing dataset.
+
+The schema of the dataset and the index are written every FLUSH_INTERVAL seconds (group commit) instead of after
+every batch, and the row ranges of a station which follow each other are merged. A batch is only acknowledged after
+the flush which contains it, so the station keeps every batch until it is stored.
+"""
+
+STATION_COLUMN = "station"
+INDEX_FILE = "index.json"
+TRAJECTORY_DIRECTORY = "trajectories"
+DEFAULT_PORT = 9755
+FLUSH_INTERVAL = 0.2  # s
+
+
+def parse_address(address):
+    # "<host>:<port>" or only "<port>" for localhost
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def read_index(directory):
+    with open(os.path.join(directory, INDEX_FILE)) as file:
+        return json.load(file)
+
+
+def encode_message(message):
+    # timestamps and other values which are not JSON types are sent as strings
+    return (json.dumps(message, default=str) + "\n").encode()
+
+
+class _CollectorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _CollectorHandler(socketserver.StreamRequestHandler):
+
+    def __write(self, message):
+        with self.__write_lock:
+            self.wfile.write(encode_message(message))
+
+    def __send_acks(self, acks):
+        # the acknowledgements wait for the flushes in their own thread, so the next batches are read in the meantime
+        while True:
+            item = acks.get()
+            if item is None:
+                return
+
+            flush_number, batch = item
+            if not self.server.collector.wait_for_flush(flush_number):
+                # the collector was stopped before the batch was flushed
+                return
+
+            self.__write({"ack": batch})
+
+    def handle(self):
+        self.__write_lock = threading.Lock()
+        acks = queue.Queue()
+        ack_thread = threading.Thread(target=self.__send_acks, args=(acks,), name="ResultCollector acks", daemon=True)
+        ack_thread.start()
+
+        try:
+            self.__read_messages(acks)
+        finally:
+            acks.put(None)
+            ack_thread.join()
+
+    def __read_messages(self, acks):
+        station = None
+
+        for line in self.rfile:
+            message = json.loads(line)
+
+            if message["type"] == "hello":
+                problem = self.server.collector.check_hello(message["station"], message["columns"])
+                if problem:
+                    self.__write({"error": problem})
+                    return
+
+                station = (message["station"], message["run"])
+
+            elif station is None:
+                self.__write({"error": "a connection has to start with a hello message"})
+                return
+
+            else:
+                try:
+                    acks.put((self.server.collector.add_batch(station, message), message["batch"]))
+                except ValueError as error:
+                    # e.g. a value which does not fit into its column
+                    self.__write({"error": str(error)})
+                    return
+
+
+class ResultCollector:
+
+    @staticmethod
+    def get_column_types():
+        column_types = list(PointingExperimentModel.COLUMN_TYPES.items())
+        column_types.append((STATION_COLUMN, "str"))
+
+        return column_types
+
+    def __init__(self, directory, host="localhost", port=DEFAULT_PORT):
+        # numpy is only needed by the collector, not by the stations
+        from columnar_store import ColumnarWriter
+
+        self.__directory = directory
+        self.__writer = ColumnarWriter(directory, self.get_column_types(), append=True)
+        # guards everything below, the handlers wait for the flushes with the condition
+        self.__condition = threading.Condition()
+        self.__flush_number = 1  # number of the next flush
+        self.__has_unflushed_batches = False
+        self.__running = True
+
+        # (station, run) -> number of the last stored batch
+        self.__last_batches = {}
+        # station -> {"row_ranges": [[first row, row count], ...], "trajectories": [...]}
+        self.__index = {}
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            self.__index = read_index(directory)["stations"]
+        self.__write_index()
+        self.__row_keys = self.__read_row_keys()
+
+        self.__server = _CollectorServer((host, port), _CollectorHandler)
+        self.__server.collector = self
+        self.__thread = None
+
+        self.__flush_thread = threading.Thread(target=self.__run_flushes, name="ResultCollector flush", daemon=True)
+        self.__flush_thread.start()
+
+    def get_address(self):
+        # the actual port if the collector was created with port 0
+        return self.__server.server_address
+
+    def check_hello(self, station, columns):
+        """Returns why the rows of a station can not be collected, None if they fit into the dataset."""
+        from columnar_store import STR_LENGTH
+
+        if list(columns) != list(PointingExperimentModel.COLUMN_TYPES):
+            return "the columns do not match the columns of the collector"
+
+        if len(str(station).encode()) > STR_LENGTH:
+            return "the station name {0} is longer than {1} bytes".format(station, STR_LENGTH)
+
+        return None
+
+    @staticmethod
+    def __get_row_key(station, row):
+        columns = list(PointingExperimentModel.COLUMN_TYPES)
+        participant_id = row[columns.index(ConfigKeys.PARTICIPANT_ID.value)]
+        condition = row[columns.index(PointingExperimentModel.CONDITION)]
+        # the timestamp is a string in the messages and a numpy datetime64 in the dataset
+        timestamp = datetime.fromisoformat(str(row[columns.index(PointingExperimentModel.TIMESTAMP)]))
+
+        return station, int(participant_id), int(condition), timestamp
+
+    def __read_row_keys(self):
+        # the keys of the rows which were stored before the collector was started
+        from columnar_store import load_columns
+
+        columns = load_columns(self.__directory)
+        stations = [station.decode() for station in columns[STATION_COLUMN]]
+        rows = zip(*(columns[column] for column in PointingExperimentModel.COLUMN_TYPES))
+
+        return {self.__get_row_key(station, row) for station, row in zip(stations, rows)}
+
+    def __write_index(self):
+        # replaced at once, like the schema of the dataset
+        temporary_file_name = os.path.join(self.__directory, INDEX_FILE + ".tmp")
+        with open(temporary_file_name, "w") as file:
+            json.dump({"stations": self.__index}, file)
+        os.replace(temporary_file_name, os.path.join(self.__directory, INDEX_FILE))
+
+    def __write_trajectory(self, station, name, data):
+        # only the file name is used and the station name is escaped, so a station can not write outside of its
+        # directory
+        directory = os.path.join(self.__directory, TRAJECTORY_DIRECTORY, re.sub(r"[^\w-]", "_", station))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, os.path.basename(name)), "wb") as file:
+            file.write(base64.b64decode(data))
+
+    def __add_rows(self, station_name, entry, message_rows):
+        rows = []
+        row_keys = []
+        for row in message_rows:
+            row_key = self.__get_row_key(station_name, row)
+            if row_key not in self.__row_keys and row_key not in row_keys:
+                row_keys.append(row_key)
+                rows.append(row + [station_name])
+
+        if not rows:
+            return
+
+        first_row = self.__writer.get_row_count()
+        try:
+            self.__writer.write_rows(rows)
+        except Exception:
+            # no part of the batch is kept, it is sent again by the station
+            self.__writer.truncate(first_row)
+            raise
+
+        # only stored rows are known, so a batch which could not be written is not ignored when it is sent again
+        self.__row_keys.update(row_keys)
+
+        row_ranges = entry["row_ranges"]
+        if row_ranges and sum(row_ranges[-1]) == first_row:
+            row_ranges[-1][1] += len(rows)
+        else:
+            row_ranges.append([first_row, len(rows)])
+
+    def add_batch(self, station, message):
+        """Stores the batch and returns the number of the flush after which it can be acknowledged."""
+        station_name = str(station[0])
+
+        with self.__condition:
+            if message["batch"] > self.__last_batches.get(station, 0):
+                entry = self.__index.setdefault(station_name, {"row_ranges": [], "trajectories": []})
+
+                if message["type"] == "rows":
+                    self.__add_rows(station_name, entry, message["rows"])
+
+                elif message["type"] == "trajectory":
+                    # a trajectory which is sent again replaces the file
+                    self.__write_trajectory(station_name, message["name"], message["data"])
+                    if os.path.basename(message["name"]) not in entry["trajectories"]:
+                        entry["trajectories"].append(os.path.basename(message["name"]))
+
+                self.__last_batches[station] = message["batch"]
+
+            # a batch which was sent again after a reconnect may not have been flushed yet either
+            self.__has_unflushed_batches = True
+            return self.__flush_number
+
+    def wait_for_flush(self, flush_number):
+        """Waits until the flush with the number has been written, False if the collector was stopped before."""
+        with self.__condition:
+            while self.__flush_number <= flush_number and self.__running:
+                self.__condition.wait()
+
+            return self.__flush_number > flush_number
+
+    def __flush(self):
+        # called with the condition
+        if self.__has_unflushed_batches:
+            self.__writer.flush()
+            self.__write_index()
+            self.__has_unflushed_batches = False
+
+        self.__flush_number += 1
+        self.__condition.notify_all()
+
+    def __run_flushes(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+
+            with self.__condition:
+                if not self.__running:
+                    return
+
+                if self.__has_unflushed_batches:
+                    self.__flush()
+
+    def start(self):
+        # serves in a background thread, e.g. for a loopback collector in the same process
+        self.__thread = threading.Thread(target=self.serve_forever, name="ResultCollector", daemon=True)
+        self.__thread.start()
+
+    def serve_forever(self):
+        self.__server.serve_forever()
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+
+        self.__server.shutdown()
+        self.__server.server_close()
+
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+
+        self.__flush_thread.join()
+
+        with self.__condition:
+            self.__flush()
+            self.__writer.close()
+
+
+class CollectorSink:
+    """Sink for the ResultWriter (see result_writer.py) which sends the rows to a ResultCollector."""
+
+    MIN_BACKOFF = 0.1  # s
+    MAX_BACKOFF = 5.0  # s
+    ACK_TIMEOUT = 0.5  # s, waiting time for acknowledgements before new batches are sent
+
+    def __init__(self, address, station, window=8, close_timeout=10.0):
+        self.__address = address
+        self.__station = station
+        # identifies this run of the station, so the batch numbers of a restarted station are not ignored
+        self.__run_id = uuid.uuid4().hex
+        self.__window = window
+        self.__close_timeout = close_timeout
+        self.__columns = None
+
+        self.__queue = queue.Queue()
+        self.__closed = False
+
+        # only used by the background thread
+        self.__next_batch = 1
+        self.__unacked = collections.OrderedDict()  # batch number -> encoded message
+        self.__unsent = collections.deque()
+        self.__socket = None
+        self.__received = b""
+        self.__backoff = self.MIN_BACKOFF
+        self.__next_attempt = 0
+
+        self.__thread = threading.Thread(target=self.__run, name="CollectorSink", daemon=True)
+        self.__thread.start()
+
+    def write_header(self, columns):
+        self.__queue.put(("header", list(columns)))
+
+    def write_rows(self, rows):
+        self.__queue.put(("rows", [list(values) for values in rows]))
+
+    def write_trajectory(self, name, data):
+        # data are the bytes of a trajectory file
+        self.__queue.put(("trajectory", name, base64.b64encode(data).decode()))
+
+    def flush(self, durable=False):
+        # the batches are sent as soon as possible anyway
+        pass
+
+    def close(self):
+        """Waits until all batches are acknowledged, at most close_timeout seconds."""
+        if self.__closed:
+            return
+
+        self.__closed = True
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def __add_batch(self, item):
+        if item[0] == "header":
+            self.__columns = item[1]
+            return
+
+        if item[0] == "rows":
+            message = {"type": "rows", "batch": self.__next_batch, "rows": item[1]}
+        else:
+            message = {"type": "trajectory", "batch": self.__next_batch, "name": item[1], "data": item[2]}
+
+        self.__unacked[self.__next_batch] = encode_message(message)
+        self.__unsent.append(self.__next_batch)
+        self.__next_batch += 1
+
+    def __connect(self):
+        if time.monotonic() < self.__next_attempt:
+            time.sleep(min(self.__next_attempt - time.monotonic(), self.ACK_TIMEOUT))
+            return False
+
+        try:
+            self.__socket = socket.create_connection(self.__address, timeout=self.ACK_TIMEOUT)
+            self.__socket.sendall(encode_message({"type": "hello", "station": self.__station, "run": self.__run_id,
+                                                  "columns": self.__columns}))
+        except OSError:
+            self.__disconnect()
+            self.__next_attempt = time.monotonic() + self.__backoff
+            self.__backoff = min(self.__backoff * 2, self.MAX_BACKOFF)
+            return False
+
+        self.__backoff = self.MIN_BACKOFF
+        return True
+
+    def __disconnect(self):
+        if self.__socket:
+            self.__socket.close()
+            self.__socket = None
+
+        # everything which was not acknowledged is sent again after the next connect
+        self.__received = b""
+        self.__unsent = collections.deque(self.__unacked)
+
+    def __send_batches(self):
+        # at most window batches are sent without acknowledgement
+        in_flight = len(self.__unacked) - len(self.__unsent)
+
+        while self.__unsent and in_flight < self.__window:
+            self.__socket.sendall(self.__unacked[self.__unsent.popleft()])
+            in_flight += 1
+
+    def __receive_acks(self):
+        try:
+            data = self.__socket.recv(65536)
+        except socket.timeout:
+            return
+
+        if not data:
+            raise ConnectionError("the collector closed the connection")
+
+        *lines, self.__received = (self.__received + data).split(b"\n")
+        for line in lines:
+            message = json.loads(line)
+
+            if "error" in message:
+                raise ValueError(message["error"])
+
+            self.__unacked.pop(message["ack"], None)
+
+    def __run(self):
+        closing = False
+        deadline = None
+
+        while True:
+            # waits for new batches only if nothing has to be sent
+            try:
+                while not closing:
+                    item = self.__queue.get(block=not self.__unacked)
+                    if item is None:
+                        closing = True
+                        deadline = time.monotonic() + self.__close_timeout
+                    else:
+                        self.__add_batch(item)
+            except queue.Empty:
+                pass
+
+            if not self.__unacked and closing:
+                break
+
+            if closing and time.monotonic() > deadline:
+                sys.stderr.write("{0} batches were not acknowledged by the collector\n".format(len(self.__unacked)))
+                break
+
+            if self.__socket is None and not self.__connect():
+                continue
+
+            try:
+                self.__send_batches()
+                self.__receive_acks()
+            except OSError:
+                self.__disconnect()
+            except ValueError as error:
+                # the collector does not accept the rows of this station, e.g. because of other columns
+                sys.stderr.write("the collector rejected the results: {0}\n".format(error))
+                break
+
+        self.__disconnect()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: result_collector.py <output columnar directory> [port] [host]\n")
+        sys.exit(1)
+
+    try:
+        collector = ResultCollector(sys.argv[1], sys.argv[3] if len(sys.argv) > 3 else "localhost",
+                                    int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT)
+    except ValueError as error:
+        # the output directory contains a dataset with other columns
+        sys.stderr.write("{0}\n".format(error))
+        sys.exit(1)
+    sys.stderr.write("collecting results on {0}:{1}\n".format(*collector.get_address()))
+
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.stop()
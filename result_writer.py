@@ -0,0 +1,255 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+"""
+Writes the result rows of the experiment in CSV format without delaying the GUI thread.
+
+The rows are put into a queue and written by a background thread in batches, so a slow terminal or pipe does not
+add latency to the next trial. Where the rows are written to is defined by a sink:
+    - StdoutSink: stdout, like before
+    - FileSink: a file
+    - RotatingFileSink: a file which is renamed to <name>.1, <name>.2, ... once it is larger than max_bytes
+    - ColumnarSink: a typed columnar directory (see columnar_store.py)
+    - TeeSink: several of the sinks above
+
+Two durability modes are supported:
+    - bounded_loss: the background thread flushes the sink at least every flush_interval seconds,
+      so at most the rows of the last flush_interval are lost if the process crashes
+    - strict: every row is written, flushed and synced to disk on the calling thread before write_row returns
+
+The CSV output is the same in both modes: every value is converted with str() and the values are separated by commas.
+
+If a sink fails in the background thread, e.g. because a value does not fit into a column of the columnar directory,
+no more rows are written and the error is passed to error_callback (on the background thread), so the experiment
+is not continued without results. In strict mode write_row raises the error instead. A TeeSink only leaves out the
+sink which failed, the other sinks keep writing.
+"""
+
+
+class CsvSink:
+
+    @staticmethod
+    def format_row(values):
+        return ",".join(map(str, values)) + "\n"
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write_header(self, columns):
+        self.write_rows([columns])
+
+    def write_rows(self, rows):
+        self._stream.write("".join(map(self.format_row, rows)))
+
+    def flush(self, durable=False):
+        self._stream.flush()
+
+        if durable:
+            try:
+                os.fsync(self._stream.fileno())
+            except (OSError, ValueError):
+                # terminals and pipes can not be synced
+                pass
+
+    def close(self):
+        self._stream.close()
+
+
+class StdoutSink(CsvSink):
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    def close(self):
+        # stdout stays open for the rest of the program
+        self.flush()
+
+
+class FileSink(CsvSink):
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        super().__init__(open(file_name, "w"))
+
+
+class RotatingFileSink(FileSink):
+
+    def __init__(self, file_name, max_bytes=10 * 1024 * 1024):
+        super().__init__(file_name)
+
+        self.__max_bytes = max_bytes
+        self.__header = None
+        self.__file_count = 0
+
+    def __rotate(self):
+        self._stream.close()
+
+        self.__file_count += 1
+        os.replace(self.file_name, "{0}.{1}".format(self.file_name, self.__file_count))
+
+        # every file starts with the column names, so each of them can be read on its own
+        self._stream = open(self.file_name, "w")
+        if self.__header:
+            super().write_rows([self.__header])
+
+    def write_header(self, columns):
+        self.__header = columns
+        super().write_header(columns)
+
+    def write_rows(self, rows):
+        super().write_rows(rows)
+
+        if self._stream.tell() >= self.__max_bytes:
+            self.__rotate()
+
+
+class TeeSink:
+    """Writes the rows to several sinks, e.g. to stdout in CSV format and to a columnar directory."""
+
+    def __init__(self, sinks):
+        self.__sinks = list(sinks)
+
+    def __call_sinks(self, method_name, *args):
+        for sink in list(self.__sinks):
+            try:
+                getattr(sink, method_name)(*args)
+            except Exception as error:
+                if len(self.__sinks) == 1:
+                    # nothing is written anymore, so the ResultWriter has to know about it
+                    raise
+
+                # the rows are still written to the other sinks
+                self.__sinks.remove(sink)
+                sys.stderr.write("the results are no longer written to the {0}: {1}\n".format(type(sink).__name__,
+                                                                                              error))
+
+    def write_header(self, columns):
+        self.__call_sinks("write_header", columns)
+
+    def write_rows(self, rows):
+        self.__call_sinks("write_rows", rows)
+
+    def flush(self, durable=False):
+        self.__call_sinks("flush", durable)
+
+    def close(self):
+        self.__call_sinks("close")
+
+
+class ResultWriter:
+    DURABILITY_BOUNDED_LOSS = "bounded_loss"
+    DURABILITY_STRICT = "strict"
+
+    SINK_STDOUT = "stdout"
+    SINK_FILE = "file"
+    SINK_ROTATING_FILE = "rotating_file"
+
+    @staticmethod
+    def create_sink(sink_type, file_name=None):
+        if sink_type == ResultWriter.SINK_FILE:
+            return FileSink(file_name)
+        elif sink_type == ResultWriter.SINK_ROTATING_FILE:
+            return RotatingFileSink(file_name)
+
+        return StdoutSink()
+
+    def __init__(self, sink, columns, durability=DURABILITY_BOUNDED_LOSS, flush_interval=0.1, batch_size=256,
+                 error_callback=None):
+        self.__sink = sink
+        self.__strict = durability == self.DURABILITY_STRICT
+        self.__flush_interval = flush_interval
+        self.__batch_size = batch_size
+        self.__closed = False
+
+        # in strict mode the errors are raised by write_row instead
+        self.__error_callback = error_callback
+        self.__error = None
+
+        self.__queue = queue.Queue()
+        self.__thread = None
+
+        # the column names are written before the background thread is started
+        self.__sink.write_header(columns)
+        self.__sink.flush(durable=self.__strict)
+
+        if not self.__strict:
+            self.__thread = threading.Thread(target=self.__run, name="ResultWriter", daemon=True)
+            self.__thread.start()
+
+    def __run(self):
+        try:
+            self.__write_queued_rows()
+        except Exception as error:
+            self.__error = error
+            if self.__error_callback:
+                self.__error_callback(error)
+            else:
+                sys.stderr.write("the results could not be written: {0}\n".format(error))
+
+    def __write_queued_rows(self):
+        last_flush = time.monotonic()
+        has_unflushed_rows = False
+        running = True
+
+        while running:
+            rows = []
+
+            try:
+                rows.append(self.__queue.get(timeout=self.__flush_interval))
+
+                # write all rows which are already waiting at once
+                while len(rows) < self.__batch_size:
+                    rows.append(self.__queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if None in rows:
+                # close was called, None is always the last element in the queue
+                rows.remove(None)
+                running = False
+
+            if rows:
+                self.__sink.write_rows(rows)
+                has_unflushed_rows = True
+
+            if has_unflushed_rows and (not running or time.monotonic() - last_flush >= self.__flush_interval):
+                self.__sink.flush()
+                last_flush = time.monotonic()
+                has_unflushed_rows = False
+
+    def write_row(self, values):
+        if self.__strict:
+            try:
+                self.__sink.write_rows([values])
+                self.__sink.flush(durable=True)
+            except Exception as error:
+                # close does not raise the error of the failed sink again
+                self.__error = error
+                raise
+        else:
+            self.__queue.put(list(values))
+
+    def get_error(self):
+        # the error which stopped the background thread (or the last error of write_row in strict mode),
+        # None if all rows were written
+        return self.__error
+
+    def close(self):
+        if self.__closed:
+            return
+
+        self.__closed = True
+
+        if self.__thread:
+            self.__queue.put(None)
+            self.__thread.join()
+
+        try:
+            self.__sink.close()
+        except Exception:
+            if self.__error is None:
+                raise
+            # the sink already failed and the error was reported
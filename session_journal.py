@@ -0,0 +1,105 @@
+import json
+import os
+import queue
+import threading
+
+"""
+Append-only journal of a session, so a session can be resumed after the program crashed or was closed.
+
+The journal is a file with one JSON record per line:
+    - {"type": "session", ...}: the seed of the random generator of the session and the ids of the conditions,
+      written once when the session is started
+    - {"type": "resume"}: the session was started again
+    - {"type": "row", "condition": ..., "trial": ..., "values": [...]}: a result row and the trial it belongs to
+    - {"type": "trial", "condition": ..., "trial": ...}: the trial was completed, i.e. the target was clicked
+If the session is started again with the same journal, the PointingExperimentModel restores the random generator,
+skips all completed trials and writes the rows of the completed trials to the (new) result files again, so every
+row is written exactly once. The rows of a trial that was not completed before a resume are left out, as the trial is
+repeated.
+
+Records are written with group commit: append only puts the record into a queue and returns, a background thread
+writes all records which are waiting at once and syncs the file once per group. So a click never waits for the disk,
+and a record is lost only if the program crashes before its group was synced. An incomplete last line, as written by
+a crash in the middle of a write, is ignored and removed when the journal is opened again.
+"""
+
+
+class SessionJournal:
+    SESSION = "session"
+    ROW = "row"
+    TRIAL = "trial"
+    RESUME = "resume"
+
+    @staticmethod
+    def read(file_name):
+        """Returns the complete records of the journal and the length of the file up to the last complete record."""
+        records = []
+        length = 0
+
+        if not os.path.exists(file_name):
+            return records, length
+
+        with open(file_name, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+
+                length += len(line)
+
+        return records, length
+
+    def __init__(self, file_name):
+        self.__records, length = self.read(file_name)
+
+        self.__file = open(file_name, "ab")
+        # removes an incomplete last record, the next record would be appended to it otherwise
+        self.__file.truncate(length)
+
+        self.__queue = queue.Queue()
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__run, name="SessionJournal", daemon=True)
+        self.__thread.start()
+
+    def get_records(self):
+        # records written before the journal was opened
+        return self.__records
+
+    def __run(self):
+        running = True
+
+        while running:
+            # waits for the first record of the next group and takes all records which arrived in the meantime
+            records = [self.__queue.get()]
+            try:
+                while True:
+                    records.append(self.__queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if None in records:
+                # close was called, None is always the last element in the queue
+                records.remove(None)
+                running = False
+
+            if records:
+                # values which are not JSON types, e.g. the timestamps, are stored as strings
+                self.__file.write("".join(json.dumps(record, default=str) + "\n" for record in records).encode())
+                self.__file.flush()
+                os.fsync(self.__file.fileno())
+
+    def append(self, record):
+        self.__queue.put(record)
+
+    def close(self):
+        if self.__closed:
+            return
+
+        self.__closed = True
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__file.close()
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+import json
+import random
+import sys
+
+from circle_layout import CircleLayout
+from config_parsing import ConfigParsing
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel, SessionPlanKeys
+
+"""
+Compiles a test configuration into a session plan before the session starts:
+    python3 session_plan.py <test_config.ini|.json> <session_plan.json>
+
+The plan is the test configuration together with the order of the target positions and the positions of all
+distractor circles for every trial of every condition. It can be used as config file of pointing_experiment.py,
+in which case no layout has to be computed between the trials and the session is exactly reproducible on every machine.
+If the config contains a layout_seed, compiling it again results in the same plan.
+"""
+
+
+class SessionPlan:
+
+    @staticmethod
+    def compile(config):
+        seed = config.get(ConfigKeys.LAYOUT_SEED.value)
+        order_random = random.Random(seed)
+        layout = CircleLayout(PointingExperimentModel.WINDOW_WIDTH, PointingExperimentModel.WINDOW_HEIGHT, seed)
+
+        session_plan = []
+        for condition in config[ConfigKeys.CONDITIONS.value]:
+            target_positions = list(config[ConfigKeys.TARGET_POSITIONS.value])
+            order_random.shuffle(target_positions)
+
+            diameter = condition[ConfigKeys.CIRCLE_SIZE.value]
+            distractor_count = condition[ConfigKeys.CIRCLE_COUNT.value] - 1
+
+            session_plan.append([{
+                SessionPlanKeys.TARGET_POSITION.value: target_position,
+                SessionPlanKeys.CIRCLE_POSITIONS.value: layout.create_positions(distractor_count, diameter,
+                                                                                target_position)
+            } for target_position in target_positions])
+
+        plan = dict(config)
+        plan[ConfigKeys.SESSION_PLAN.value] = session_plan
+
+        return plan
+
+    @staticmethod
+    def write(plan, file_name):
+        with open(file_name, "w") as file:
+            json.dump(plan, file, separators=(",", ":"))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.stderr.write("usage: session_plan.py <test config> <session plan output file>\n")
+        sys.exit(1)
+
+    try:
+        session_plan = SessionPlan.compile(ConfigParsing(sys.argv[1]).get_config())
+    except ValueError as error:
+        sys.stderr.write("{0}\n".format(error))
+        sys.exit(1)
+
+    SessionPlan.write(session_plan, sys.argv[2])
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+
+import math
+import os
+import random
+import sys
+import time
+
+from PyQt5 import QtGui, QtWidgets, QtCore
+
+from config_parsing import ConfigParsing
+from input_clock import InputClock
+from pointing_experiment import MainWindow
+from virtual_pointer_device import VirtualPointerDevice, FakeUInput
+
+"""
+Runs the pointing experiment without a human, e.g. to test the throughput of the whole pipeline before a study:
+    python3 simulated_participant.py <test_config.ini|.json> [number of sessions]
+
+The MainWindow is shown on the offscreen Qt platform and a SimulatedParticipant sends mouse events to it,
+so the real click handling, timing and output code is used. No real time passes: the participant has its own clock,
+which is passed to the InputClock of the experiment and used as timestamp of the mouse events.
+
+The movement time of every trial follows Fitts' law, MT = a + b * log2(D / W + 1), multiplied with log-normal noise.
+With the probability error_rate the participant first misses the target and clicks next to it.
+If trajectory_rate is larger than 0, mouse move events along a minimum jerk trajectory are sent with this rate (in Hz),
+so the trajectory recorder and the pointing technique are used as well.
+The novel pointer uses a fake virtual device, so no root privileges are needed.
+"""
+
+
+class SimulatedClock:
+
+    def __init__(self):
+        self.__ns = 0
+
+    def now(self):
+        return self.__ns
+
+    def advance(self, ms):
+        self.__ns += int(ms * 1000000)
+
+
+class SimulatedParticipant:
+
+    @staticmethod
+    def __minimum_jerk(t):
+        return 10 * t ** 3 - 15 * t ** 4 + 6 * t ** 5
+
+    def __init__(self, window, clock, a=200.0, b=150.0, noise=0.1, error_rate=0.05, trajectory_rate=0, seed=None):
+        # a and b are the Fitts' law parameters in ms and ms/bit
+        self.__window = window
+        self.__clock = clock
+        self.__a = a
+        self.__b = b
+        self.__noise = noise
+        self.__error_rate = error_rate
+        self.__trajectory_rate = trajectory_rate
+        self.__random = random.Random(seed)
+        self.__position = QtCore.QPoint(0, 0)
+
+    def __send_mouse_event(self, event_type, pos, button=QtCore.Qt.NoButton):
+        widget = self.__window.childAt(pos) or self.__window
+        buttons = button if event_type == QtCore.QEvent.MouseButtonPress else QtCore.Qt.NoButton
+
+        event = QtGui.QMouseEvent(event_type, QtCore.QPointF(widget.mapFrom(self.__window, pos)),
+                                  QtCore.QPointF(self.__window.mapToGlobal(pos)), button, buttons,
+                                  QtCore.Qt.NoModifier)
+        # Qt event timestamps are in ms, 0 means no timestamp
+        event.setTimestamp(self.__clock.now() // 1000000 + 1)
+        QtWidgets.QApplication.sendEvent(widget, event)
+
+    def __click(self, pos):
+        self.__send_mouse_event(QtCore.QEvent.MouseButtonPress, pos, QtCore.Qt.LeftButton)
+        self.__send_mouse_event(QtCore.QEvent.MouseButtonRelease, pos, QtCore.Qt.LeftButton)
+
+    def __move(self, pos, movement_time):
+        start = self.__position
+        sample_count = int(movement_time * self.__trajectory_rate / 1000)
+
+        for i in range(1, sample_count + 1):
+            self.__clock.advance(movement_time / sample_count)
+            s = self.__minimum_jerk(i / sample_count)
+            self.__send_mouse_event(QtCore.QEvent.MouseMove, QtCore.QPoint(
+                round(start.x() + s * (pos.x() - start.x())), round(start.y() + s * (pos.y() - start.y()))))
+
+        if sample_count == 0:
+            self.__clock.advance(movement_time)
+
+        self.__position = pos
+
+    def __get_movement_time(self, distance, width):
+        index_of_difficulty = math.log2(distance / width + 1)
+        return (self.__a + self.__b * index_of_difficulty) * math.exp(self.__random.gauss(0, self.__noise))
+
+    def __get_random_point_in(self, rect):
+        # uniformly distributed point in the circle inside of rect
+        radius = rect.width() / 2 * math.sqrt(self.__random.random()) * 0.9
+        angle = self.__random.uniform(0, 2 * math.pi)
+        center = rect.center()
+
+        return QtCore.QPoint(round(center.x() + radius * math.cos(angle)), round(center.y() + radius * math.sin(angle)))
+
+    def __run_trial(self):
+        start_pos = self.__get_random_point_in(self.__window.get_start_rect())
+        self.__move(start_pos, self.__a)
+        self.__click(start_pos)
+
+        target_rect = self.__window.get_target_rect()
+        target_pos = self.__get_random_point_in(target_rect)
+        distance = math.dist([start_pos.x(), start_pos.y()], [target_pos.x(), target_pos.y()])
+        movement_time = self.__get_movement_time(distance, target_rect.width())
+
+        if self.__random.random() < self.__error_rate:
+            # overshoot, the click lands next to the target
+            angle = self.__random.uniform(0, 2 * math.pi)
+            offset = target_rect.width() * 0.75
+            miss_pos = QtCore.QPoint(round(target_rect.center().x() + offset * math.cos(angle)),
+                                     round(target_rect.center().y() + offset * math.sin(angle)))
+            self.__move(miss_pos, movement_time)
+            self.__click(miss_pos)
+            movement_time = self.__get_movement_time(offset, target_rect.width())
+
+        self.__move(target_pos, movement_time)
+        self.__click(target_pos)
+
+    def run(self):
+        trial_count = 0
+
+        while not self.__window.is_finished():
+            self.__run_trial()
+            trial_count += 1
+
+        return trial_count
+
+
+if __name__ == '__main__':
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    test_config = ConfigParsing().get_config()
+    session_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    total_trial_count = 0
+    start_time = time.perf_counter()
+
+    for session in range(session_count):
+        simulated_clock = SimulatedClock()
+        pointer_device = VirtualPointerDevice(FakeUInput)
+
+        trial = MainWindow(test_config, pointer_device, InputClock(simulated_clock.now), headless=True)
+        trial.show()
+
+        total_trial_count += SimulatedParticipant(trial, simulated_clock, seed=session).run()
+        trial.close()
+
+    duration = time.perf_counter() - start_time
+    sys.stderr.write("{0} trials in {1:.2f} s ({2:.0f} trials/s)\n".format(
+        total_trial_count, duration, total_trial_count / duration))
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fitts_metrics import compute_trial_metrics
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel
+
+"""
+Statistics of the pointing experiment, normal vs. novel pointer per condition:
+    python3 statistics_engine.py <columnar directory> [number of resamples]   (see ingest_sessions.py)
+
+    - describe_conditions: descriptive statistics of the task completion times per condition and pointer type,
+      instead of one describe() per condition
+    - repeated_measures_anova: two-way repeated measures ANOVA (pointer type x condition) of the mean task completion
+      times of every participant
+    - pairwise_tests: pairwise tests of the pointer types within every condition
+    - bootstrap_differences: bootstrap confidence intervals of the mean difference novel - normal per condition
+
+Only the clicks on the target with a valid task completion time are used (see fitts_metrics.py).
+The ANOVA and the pairwise tests use pingouin, which is only imported when they are computed.
+
+The bootstrap resamples the participants, so the paired design is kept: for every participant the difference of the
+mean task completion times of both pointers is computed once, and every resample is the mean of n differences drawn
+with replacement. All resamples of a chunk are drawn at once as one (resamples x n) index array, and the chunks of
+all conditions are computed in parallel by a ProcessPoolExecutor. Every chunk gets its own random generator spawned
+from the seed, so the result only depends on the seed and not on the number of processes.
+"""
+
+NORMAL_POINTER = "normal"
+NOVEL_POINTER = "novel"
+
+DEFAULT_RESAMPLE_COUNT = 10000
+# maximum number of drawn indices per chunk, i.e. resamples x participants, to limit the memory of every process
+CHUNK_ELEMENT_COUNT = 2000000
+
+# names of the computed columns
+MEAN_DIFFERENCE = "mean_difference_in_ms"
+CI_LOW = "ci_low_in_ms"
+CI_HIGH = "ci_high_in_ms"
+PARTICIPANT_COUNT = "participant_count"
+
+
+def get_participant_means(trials, dv=PointingExperimentModel.TASK_COMPLETION_TIME):
+    # one mean per participant, condition and pointer type, as needed by the repeated measures tests
+    return trials.groupby([ConfigKeys.PARTICIPANT_ID.value, PointingExperimentModel.CONDITION,
+                           ConfigKeys.POINTER_TYPE.value], as_index=False)[dv].mean()
+
+
+def describe_conditions(trials, dv=PointingExperimentModel.TASK_COMPLETION_TIME):
+    return trials.groupby([PointingExperimentModel.CONDITION, ConfigKeys.POINTER_TYPE.value])[dv].describe()
+
+
+def repeated_measures_anova(trials, dv=PointingExperimentModel.TASK_COMPLETION_TIME):
+    import pingouin as pg
+
+    return pg.rm_anova(data=get_participant_means(trials, dv), dv=dv, subject=ConfigKeys.PARTICIPANT_ID.value,
+                       within=[ConfigKeys.POINTER_TYPE.value, PointingExperimentModel.CONDITION])
+
+
+def pairwise_tests(trials, dv=PointingExperimentModel.TASK_COMPLETION_TIME, padjust="holm"):
+    import pingouin as pg
+
+    # pairwise_ttests is the name in older versions of pingouin
+    tests = getattr(pg, "pairwise_tests", None) or pg.pairwise_ttests
+
+    return tests(data=get_participant_means(trials, dv), dv=dv, subject=ConfigKeys.PARTICIPANT_ID.value,
+                 within=[PointingExperimentModel.CONDITION, ConfigKeys.POINTER_TYPE.value], padjust=padjust)
+
+
+def get_paired_differences(trials, dv=PointingExperimentModel.TASK_COMPLETION_TIME):
+    """Returns the differences novel - normal of the participant means by condition, without incomplete pairs."""
+    means = get_participant_means(trials, dv).pivot_table(
+        index=[PointingExperimentModel.CONDITION, ConfigKeys.PARTICIPANT_ID.value],
+        columns=ConfigKeys.POINTER_TYPE.value, values=dv)
+    differences = (means[NOVEL_POINTER] - means[NORMAL_POINTER]).dropna()
+
+    return {condition: group.to_numpy() for condition, group in differences.groupby(level=0)}
+
+
+def resample_means(differences, resample_count, seed_sequence):
+    # bootstrap means of one chunk, all resamples are drawn at once
+    generator = np.random.default_rng(seed_sequence)
+    indices = generator.integers(0, len(differences), size=(resample_count, len(differences)), dtype=np.int32)
+
+    return differences[indices].mean(axis=1)
+
+
+def bootstrap_differences(trials, resample_count=DEFAULT_RESAMPLE_COUNT, confidence=0.95, seed=None,
+                          max_workers=None, dv=PointingExperimentModel.TASK_COMPLETION_TIME):
+    differences_by_condition = get_paired_differences(trials, dv)
+    seed_sequence = np.random.SeedSequence(seed)
+
+    # (condition, differences, number of resamples) of every chunk
+    chunks = []
+    for condition, differences in differences_by_condition.items():
+        chunk_size = max(1, CHUNK_ELEMENT_COUNT // len(differences))
+
+        for start in range(0, resample_count, chunk_size):
+            chunks.append((condition, differences, min(chunk_size, resample_count - start)))
+    chunk_seeds = seed_sequence.spawn(len(chunks))
+
+    arguments = ([differences for _, differences, _ in chunks], [count for _, _, count in chunks], chunk_seeds)
+    if max_workers == 1 or len(chunks) <= 1:
+        chunk_means = list(map(resample_means, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_means = list(executor.map(resample_means, *arguments))
+
+    means_by_condition = {}
+    for (condition, _, _), means in zip(chunks, chunk_means):
+        means_by_condition.setdefault(condition, []).append(means)
+
+    alpha = (1 - confidence) / 2
+    rows = []
+    for condition, differences in differences_by_condition.items():
+        ci_low, ci_high = np.quantile(np.concatenate(means_by_condition[condition]), [alpha, 1 - alpha])
+        rows.append({
+            PointingExperimentModel.CONDITION: condition,
+            PARTICIPANT_COUNT: len(differences),
+            MEAN_DIFFERENCE: differences.mean(),
+            CI_LOW: ci_low,
+            CI_HIGH: ci_high
+        })
+
+    return pd.DataFrame(rows).set_index(PointingExperimentModel.CONDITION)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: statistics_engine.py <columnar directory> [number of resamples]\n")
+        sys.exit(1)
+
+    from columnar_store import load_dataframe
+
+    pd.set_option("display.width", 200)
+    successful_trials = compute_trial_metrics(load_dataframe(sys.argv[1]))
+
+    print(describe_conditions(successful_trials))
+    print(bootstrap_differences(successful_trials,
+                                int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RESAMPLE_COUNT))
+
+    try:
+        print(repeated_measures_anova(successful_trials))
+        print(pairwise_tests(successful_trials))
+    except ImportError:
+        sys.stderr.write("pingouin is needed for the repeated measures ANOVA and the pairwise tests\n")
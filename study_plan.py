@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+
+import json
+import sys
+
+from config_parsing import ConfigParsing
+from pointing_experiment_model import ConfigKeys
+
+"""
+Generates the counterbalanced configs of all sessions of a study from one test config:
+    python3 study_plan.py <test_config.ini|.json> <number of participants> <study_plan.json> [balanced|latin]
+
+Every participant has one session per pointer type. The order of the pointer types alternates between the
+participants (normal/novel, novel/normal, ...). The order of the conditions of every session is a row of
+    - balanced: a balanced Latin square (Williams design), every condition follows every other condition equally
+      often. For an odd number of conditions the mirrored rows are added, so the square has 2 * n rows.
+    - latin: a cyclic Latin square, every condition is at every position equally often.
+The rows are assigned to the sessions in the order participant x session, so they are used equally often if the
+number of sessions is a multiple of the number of rows.
+
+The study plan contains the config of every session by its session id <participant>_<session>, e.g. "3_2".
+If the test config is a compiled session plan (see session_plan.py), the compiled trials are reordered together
+with the conditions. A file <study_plan.json>.validated records that the study plan was validated, so the sessions
+are not validated again every time the experiment is started.
+It can be used as config file of pointing_experiment.py with the session id as second argument:
+    python3 pointing_experiment.py study_plan.json 3_2
+"""
+
+BALANCED = "balanced"
+LATIN = "latin"
+
+
+class StudyPlan:
+
+    @staticmethod
+    def create_latin_square(n):
+        return [[(row + column) % n for column in range(n)] for row in range(n)]
+
+    @staticmethod
+    def create_balanced_latin_square(n):
+        # first row 0, 1, n-1, 2, n-2, ..., every other row is shifted by one
+        first_row = [0]
+        for i in range(1, n):
+            first_row.append((i + 1) // 2 if i % 2 == 1 else n - i // 2)
+
+        square = [[(condition + row) % n for condition in first_row] for row in range(n)]
+
+        if n % 2 == 1:
+            square += [list(reversed(row)) for row in square]
+
+        return square
+
+    @staticmethod
+    def create(config, participant_count, method=BALANCED):
+        """Returns the configs of all sessions of the study by their session id."""
+        conditions = config[ConfigKeys.CONDITIONS.value]
+        pointer_types = ConfigParsing.POINTER_TYPES
+
+        if method == BALANCED:
+            square = StudyPlan.create_balanced_latin_square(len(conditions))
+        elif method == LATIN:
+            square = StudyPlan.create_latin_square(len(conditions))
+        else:
+            raise ValueError("unknown counterbalancing method {0}".format(method))
+
+        sessions = {}
+        for participant in range(participant_count):
+            for session in range(len(pointer_types)):
+                session_config = dict(config)
+                session_config[ConfigKeys.PARTICIPANT_ID.value] = participant + 1
+                session_config[ConfigKeys.POINTER_TYPE.value] = \
+                    pointer_types[(participant + session) % len(pointer_types)]
+
+                row = square[(participant * len(pointer_types) + session) % len(square)]
+                session_config[ConfigKeys.CONDITIONS.value] = [conditions[i] for i in row]
+                if ConfigKeys.SESSION_PLAN.value in config:
+                    # the compiled trials of every condition (see session_plan.py) are in the order of the conditions
+                    session_config[ConfigKeys.SESSION_PLAN.value] = \
+                        [config[ConfigKeys.SESSION_PLAN.value][i] for i in row]
+
+                sessions["{0}_{1}".format(participant + 1, session + 1)] = session_config
+
+        return sessions
+
+    @staticmethod
+    def write(sessions, file_name):
+        problems = ConfigParsing.validate_study_plan(sessions)
+        if problems:
+            raise ValueError("\n".join(problems))
+
+        with open(file_name, "w") as file:
+            json.dump({ConfigParsing.STUDY_PLAN_SESSIONS: sessions}, file, indent=2)
+
+        # the sessions do not have to be validated again when the experiment is started
+        ConfigParsing.write_study_plan_stamp(file_name)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        sys.stderr.write("usage: study_plan.py <test config> <number of participants> <study plan output file> "
+                         "[{0}|{1}]\n".format(BALANCED, LATIN))
+        sys.exit(1)
+
+    try:
+        study_plan = StudyPlan.create(ConfigParsing(sys.argv[1]).get_config(), int(sys.argv[2]),
+                                      sys.argv[4] if len(sys.argv) > 4 else BALANCED)
+        StudyPlan.write(study_plan, sys.argv[3])
+    except ValueError as error:
+        sys.stderr.write("{0}\n".format(error))
+        sys.exit(1)
@@ -0,0 +1,285 @@
+import abc
+import threading
+import time
+
+import numpy as np
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSignal
+
+"""
+Pluggable pointing techniques, which are evaluated in a worker thread instead of the GUI thread.
+
+The techniques are selected in the config file, e.g. "techniques": ["bubble", "gain_switching"], and are run one
+after the other as stages of a TechniquePipeline. The MainWindow only submits the position of every mouse move event
+and the circles of the current trial (as numpy arrays of all centers and radii) to the pipeline. All samples which
+arrived while the worker was busy are coalesced into one batch, so the stages always work on the latest positions
+and never fall behind the input. The result of every batch is a TechniqueResult, which is sent to the GUI thread
+with a Qt signal:
+    - move: a relative cursor movement, which is written to the virtual pointer device (see virtual_pointer_device.py)
+    - selected_index: the index of the circle which is selected by a click, -1 if a click selects nothing special,
+      None if no stage selects circles
+
+Stages:
+    - magnetic: pulls the cursor towards the nearest circle when its edge is closer than capture_distance
+    - bubble: the nearest circle is always selected (bubble cursor)
+    - area_cursor: the circle is selected if it is the only one within area_radius of the cursor
+    - gain_switching: low gain near circles and high gain far away from them, by adding a part of the user's own
+      movement; the movements written by the pipeline itself are not amplified again
+
+Every sample and every movement written by the pipeline has a time (ns of the InputClock). A written movement only
+reaches the samples some time later, so it is only subtracted from the movement of the user once there is a sample
+which is newer than the movement.
+
+Every stage chooses the interval in which it needs new mouse positions (sample_interval in ms), the MainWindow submits
+the positions at the shortest interval of all stages (see input_coalescer.py).
+
+Every batch has a latency budget. Batches which take longer are counted as overruns and are written to the results
+together with the longest time of a batch (see PointingExperimentModel), so a too slow technique can be found without
+adding input lag.
+"""
+
+
+class TechniqueResult:
+
+    def __init__(self, generation):
+        # generation of the circles the result belongs to, results of earlier trials are ignored
+        self.generation = generation
+        self.move_x = 0.0
+        self.move_y = 0.0
+        self.selected_index = None
+
+
+class TechniqueStage(abc.ABC):
+    name = None
+    sample_interval = 16  # ms, one frame
+
+    @abc.abstractmethod
+    def process(self, positions, centers, radii, user_movement, result):
+        """
+        positions are the coalesced samples (n x 2), centers (m x 2) and radii (m) describe all circles,
+        user_movement is the movement of the cursor by the user since the last batch.
+        """
+
+    @staticmethod
+    def get_edge_distances(position, centers, radii):
+        # negative inside of a circle
+        return np.hypot(centers[:, 0] - position[0], centers[:, 1] - position[1]) - radii
+
+
+class MagneticStage(TechniqueStage):
+    name = "magnetic"
+
+    def __init__(self, capture_distance=30, strength=0.3):
+        self.__capture_distance = capture_distance
+        self.__strength = strength
+
+    def process(self, positions, centers, radii, user_movement, result):
+        position = positions[-1]
+        distances = self.get_edge_distances(position, centers, radii)
+        nearest = int(np.argmin(distances))
+
+        if 0 < distances[nearest] < self.__capture_distance:
+            result.move_x += self.__strength * (centers[nearest, 0] - position[0])
+            result.move_y += self.__strength * (centers[nearest, 1] - position[1])
+
+
+class BubbleStage(TechniqueStage):
+    name = "bubble"
+
+    def process(self, positions, centers, radii, user_movement, result):
+        result.selected_index = int(np.argmin(self.get_edge_distances(positions[-1], centers, radii)))
+
+
+class AreaCursorStage(TechniqueStage):
+    name = "area_cursor"
+
+    def __init__(self, area_radius=20):
+        self.__area_radius = area_radius
+
+    def process(self, positions, centers, radii, user_movement, result):
+        in_area = np.flatnonzero(self.get_edge_distances(positions[-1], centers, radii) <= self.__area_radius)
+        result.selected_index = int(in_area[0]) if len(in_area) == 1 else -1
+
+
+class GainSwitchingStage(TechniqueStage):
+    name = "gain_switching"
+    # the gain is applied to the movement between two samples, so it reacts faster with more samples
+    sample_interval = 8
+
+    def __init__(self, near_distance=50, low_gain=0.5, high_gain=1.5):
+        self.__near_distance = near_distance
+        self.__low_gain = low_gain
+        self.__high_gain = high_gain
+
+    def process(self, positions, centers, radii, user_movement, result):
+        distances = self.get_edge_distances(positions[-1], centers, radii)
+        gain = self.__low_gain if np.min(distances) < self.__near_distance else self.__high_gain
+
+        result.move_x += (gain - 1) * user_movement[0]
+        result.move_y += (gain - 1) * user_movement[1]
+
+
+STAGES = {stage.name: stage for stage in [MagneticStage, BubbleStage, AreaCursorStage, GainSwitchingStage]}
+
+
+class TechniquePipeline(QtCore.QObject):
+    result_ready = pyqtSignal(object)
+
+    @staticmethod
+    def create_stages(names):
+        unknown_names = [name for name in names if name not in STAGES]
+        if unknown_names:
+            raise ValueError("unknown pointing techniques {0}".format(", ".join(unknown_names)))
+
+        return [STAGES[name]() for name in names]
+
+    def __init__(self, stages, budget_ms=2.0, parent=None):
+        super().__init__(parent)
+
+        self.__stages = stages
+        self.__budget_ns = int(budget_ms * 1000000)
+
+        # everything below is shared with the worker thread and guarded by the condition
+        self.__condition = threading.Condition()
+        self.__samples = []
+        self.__sample_times = []
+        self.__centers = None
+        self.__radii = None
+        self.__generation = 0
+        # (t_ns, move_x, move_y) of the written movements which are not in the samples yet
+        self.__injected_movements = []
+        self.__running = False
+
+        # only used by the worker thread
+        self.__last_position = None
+        self.__last_time = None
+        self.__last_generation = None
+
+        self.__overrun_count = 0
+        self.__max_latency_ns = 0
+        self.__thread = None
+
+    def start(self):
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name="technique pipeline", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+
+    def set_circles(self, geometries):
+        """Sets the circles of the next trial as list of QRects, None if no trial is running."""
+        with self.__condition:
+            self.__generation += 1
+            self.__samples = []
+            self.__sample_times = []
+
+            if geometries:
+                self.__centers = np.array([[rect.center().x(), rect.center().y()] for rect in geometries], dtype=float)
+                self.__radii = np.array([rect.width() / 2 for rect in geometries], dtype=float)
+            else:
+                self.__centers = None
+                self.__radii = None
+
+            return self.__generation
+
+    def submit(self, x, y, t_ns):
+        # t_ns is the time of the mouse move event
+        with self.__condition:
+            self.__samples.append((x, y))
+            self.__sample_times.append(t_ns)
+            self.__condition.notify()
+
+    def add_injected_movement(self, move_x, move_y, t_ns):
+        # movements of the cursor by the pipeline itself, they are not part of the movement of the user,
+        # t_ns is the time at which the movement was written to the device
+        with self.__condition:
+            self.__injected_movements.append((t_ns, move_x, move_y))
+
+    def get_sample_interval(self):
+        return min(stage.sample_interval for stage in self.__stages)
+
+    def get_overrun_count(self):
+        return self.__overrun_count
+
+    def get_max_latency_in_ms(self):
+        return self.__max_latency_ns / 1000000
+
+    def reset_statistics(self):
+        self.__overrun_count = 0
+        self.__max_latency_ns = 0
+
+    def __take_batch(self):
+        # waits for new samples and returns them together with the circles, None if the pipeline is stopped
+        with self.__condition:
+            while self.__running and not (self.__samples and self.__centers is not None):
+                self.__condition.wait()
+
+            if not self.__running:
+                return None
+
+            # only the movements which were written before the last sample are contained in the samples
+            last_time = self.__sample_times[-1]
+            injected_movements = [movement for movement in self.__injected_movements if movement[0] <= last_time]
+            self.__injected_movements = [movement for movement in self.__injected_movements if movement[0] > last_time]
+
+            batch = (np.array(self.__samples, dtype=float), self.__sample_times, self.__centers, self.__radii,
+                     self.__generation, injected_movements)
+            self.__samples = []
+            self.__sample_times = []
+
+            return batch
+
+    def __warm_up(self):
+        # the first call of the numpy functions is much slower, it would be counted as overrun otherwise
+        positions = np.zeros((1, 2))
+        for stage in self.__stages:
+            stage.process(positions, np.ones((1, 2)), np.ones(1), np.zeros(2), TechniqueResult(None))
+
+    def __run(self):
+        self.__warm_up()
+
+        while True:
+            batch = self.__take_batch()
+            if batch is None:
+                return
+
+            start_ns = time.perf_counter_ns()
+            positions, sample_times, centers, radii, generation, injected_movements = batch
+
+            if generation != self.__last_generation:
+                # the first batch of a trial has no movement before it
+                self.__last_position = positions[0]
+                self.__last_time = sample_times[0]
+                self.__last_generation = generation
+
+            # the movements written before the last position are already contained in it
+            user_movement = positions[-1] - self.__last_position
+            for t_ns, move_x, move_y in injected_movements:
+                if t_ns > self.__last_time:
+                    user_movement -= (move_x, move_y)
+
+            self.__last_position = positions[-1]
+            self.__last_time = sample_times[-1]
+
+            result = TechniqueResult(generation)
+            for stage in self.__stages:
+                stage.process(positions, centers, radii, user_movement, result)
+
+            latency_ns = time.perf_counter_ns() - start_ns
+            self.__max_latency_ns = max(self.__max_latency_ns, latency_ns)
+            if latency_ns > self.__budget_ns:
+                self.__overrun_count += 1
+
+            try:
+                # the signal is delivered to the GUI thread by Qt
+                self.result_ready.emit(result)
+            except RuntimeError:
+                # the window was deleted without stopping the pipeline, e.g. when the program exits
+                return
@@ -0,0 +1,164 @@
+from array import array
+
+from PyQt5 import QtCore
+
+from pointing_experiment_model import PointingExperimentModel
+
+"""
+Telemetry of the event loop of a running session, so trials with system hiccups can be found in the results.
+
+For every trial the Telemetry records
+    - the input to handler delay of every mouse event (see input_clock.py),
+    - the intervals between two paint events of the window (and the circle canvas),
+    - the stalls of the event loop: during a trial a heartbeat timer runs every HEARTBEAT_INTERVAL ms, every tick that
+      comes later than expected is a stall with the length of the delay. Between the trials the timer is stopped, so
+      it does not wake up the event loop for the whole session.
+The values are counted in LatencyHistograms, so recording a value is only an index computation and an increment,
+independent of the number of values. get_summary returns the percentiles and maxima of the current trial as result
+columns of PointingExperimentModel.
+
+A LatencyHistogram has logarithmic buckets: values (in µs) below 32 have their own bucket, above that every power
+of two is divided into 16 buckets, so the relative error of a percentile is below 1/16.
+"""
+
+
+class LatencyHistogram:
+    SUB_BUCKET_BITS = 4
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+    MAX_VALUE_BITS = 40
+
+    BUCKET_COUNT = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * SUB_BUCKET_COUNT
+    MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+
+    @staticmethod
+    def get_bucket_index(value):
+        shift = max(value.bit_length() - LatencyHistogram.SUB_BUCKET_BITS - 1, 0)
+        return shift * LatencyHistogram.SUB_BUCKET_COUNT + (value >> shift)
+
+    @staticmethod
+    def get_bucket_upper_bound(index):
+        shift = max(index // LatencyHistogram.SUB_BUCKET_COUNT - 1, 0)
+        mantissa = index - shift * LatencyHistogram.SUB_BUCKET_COUNT
+        return ((mantissa + 1) << shift) - 1
+
+    def __init__(self):
+        self.__counts = array("q", bytes(8 * self.BUCKET_COUNT))
+        self.__count = 0
+        self.__max = 0
+
+    def record(self, value):
+        # value in µs, negative values are counted as 0
+        value = min(max(int(value), 0), self.MAX_VALUE)
+
+        self.__counts[self.get_bucket_index(value)] += 1
+        self.__count += 1
+        self.__max = max(self.__max, value)
+
+    def clear(self):
+        if self.__count:
+            self.__counts = array("q", bytes(8 * self.BUCKET_COUNT))
+            self.__count = 0
+            self.__max = 0
+
+    def get_count(self):
+        return self.__count
+
+    def get_max(self):
+        return self.__max
+
+    def get_percentile(self, percentile):
+        """Returns the upper bound of the bucket of the percentile (0 - 100), None if nothing was recorded."""
+        if not self.__count:
+            return None
+
+        rank = max(1, round(percentile / 100 * self.__count))
+        seen = 0
+
+        for index, count in enumerate(self.__counts):
+            seen += count
+            if seen >= rank:
+                return min(self.get_bucket_upper_bound(index), self.__max)
+
+        return self.__max
+
+
+class Telemetry(QtCore.QObject):
+    HEARTBEAT_INTERVAL = 5  # ms
+    STALL_THRESHOLD = 16  # ms, stalls which are longer than a frame are counted
+
+    def __init__(self, input_clock, painted_widgets, parent=None):
+        super().__init__(parent)
+
+        self.__input_clock = input_clock
+
+        self.__input_delays = LatencyHistogram()
+        self.__paint_intervals = LatencyHistogram()
+        self.__stalls = LatencyHistogram()
+        self.__stall_count = 0
+
+        self.__last_paint_ns = None
+        self.__last_heartbeat_ns = None
+
+        for widget in painted_widgets:
+            widget.installEventFilter(self)
+
+        self.__heartbeat = QtCore.QTimer(self)
+        self.__heartbeat.setTimerType(QtCore.Qt.PreciseTimer)
+        self.__heartbeat.setInterval(self.HEARTBEAT_INTERVAL)
+        self.__heartbeat.timeout.connect(self.__on_heartbeat)
+
+    def __on_heartbeat(self):
+        now = self.__input_clock.now()
+
+        if self.__last_heartbeat_ns is not None:
+            stall_us = (now - self.__last_heartbeat_ns) / 1000 - self.HEARTBEAT_INTERVAL * 1000
+
+            if stall_us > 0:
+                self.__stalls.record(stall_us)
+
+                if stall_us > self.STALL_THRESHOLD * 1000:
+                    self.__stall_count += 1
+
+        self.__last_heartbeat_ns = now
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Paint:
+            now = self.__input_clock.now()
+
+            if self.__last_paint_ns is not None:
+                self.__paint_intervals.record((now - self.__last_paint_ns) / 1000)
+
+            self.__last_paint_ns = now
+
+        return False
+
+    def start_trial(self):
+        self.__input_delays.clear()
+        self.__paint_intervals.clear()
+        self.__stalls.clear()
+        self.__stall_count = 0
+        self.__last_paint_ns = None
+
+        self.__last_heartbeat_ns = None
+        self.__heartbeat.start()
+
+    def end_trial(self):
+        self.__heartbeat.stop()
+
+    def record_input(self, event_timestamp):
+        # called for every mouse move, so no InputTime is created
+        self.__input_delays.record(self.__input_clock.get_delay_ns(event_timestamp) / 1000)
+
+    @staticmethod
+    def __to_ms(value_us):
+        return value_us / 1000 if value_us is not None else PointingExperimentModel.INVALID_TIME
+
+    def get_summary(self):
+        # values of the current trial by their result column, NaN if nothing was recorded
+        return {
+            PointingExperimentModel.INPUT_DELAY_P50: self.__to_ms(self.__input_delays.get_percentile(50)),
+            PointingExperimentModel.INPUT_DELAY_P99: self.__to_ms(self.__input_delays.get_percentile(99)),
+            PointingExperimentModel.PAINT_INTERVAL_P99: self.__to_ms(self.__paint_intervals.get_percentile(99)),
+            PointingExperimentModel.MAX_STALL: self.__stalls.get_max() / 1000,
+            PointingExperimentModel.STALL_COUNT: self.__stall_count
+        }
@@ -0,0 +1,414 @@
+#!/usr/bin/python3
+
+import math
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from PyQt5 import QtCore
+
+from config_parsing import ConfigParsing
+from pointing_experiment_model import ConfigKeys, PointingExperimentModel, SessionPlanKeys
+from pointing_technique import PointingTechnique
+from session_plan import SessionPlan
+from trajectory_recorder import TrajectoryRecorder
+from virtual_pointer_device import REL_X, VirtualPointerDevice, FakeUInput
+
+"""
+Evaluates parameters of the PointingTechnique (threshold and density) offline, without new participants:
+    python3 trace_replay.py <test config or session plan> [trajectory directory] [number of processes]
+
+Cursor traces are replayed through the PointingTechnique against the layouts of a session plan (see session_plan.py):
+    - recorded traces: the trajectory files of sessions with the normal pointer (see trajectory_recorder.py), the
+      config has to be the session plan of these sessions, so the target of every trial is known
+    - synthetic traces: if no trajectory directory is given, SYNTHETIC_TRACE_COUNT minimum jerk movements per trial
+      from the start circle to the target, with Fitts' law movement times and end points which are normally
+      distributed around the center of the target (effective width, see fitts_metrics.py)
+
+The replay runs in simulated time and is much faster than real time: the trace is the movement of the hand, the
+technique gets the position of the cursor every sample_interval ms and moves the cursor with a fake device
+(FakeUInput) whose movements are added to all following positions. Its QTimer is replaced by a SimulatedTimer,
+whose steps are run between the samples of the trace.
+
+For every trial the replay predicts
+    - whether the target is selected: the cursor is inside of the target when the hand stops, after the technique
+      has finished its movement (otherwise the trial is an error),
+    - the selection time: the time at which the cursor entered the target for the last time, plus the time between
+      this moment and the click in the trace without the technique (the time the participant needs to click).
+The participant only reacts to the technique in one way: once the technique has moved the cursor into the target, the
+hand stops there and the rest of the trace is not replayed. Otherwise the trace is replayed as it was recorded.
+
+sweep replays all traces for every combination of the thresholds and densities, the combinations are distributed
+to the processes of a ProcessPoolExecutor. The result has one row per combination with the predicted error rate and
+the mean and median selection time of the selected targets.
+"""
+
+THRESHOLDS = [0.05, 0.1, 0.15, 0.2, 0.25, 0.33, 0.4, 0.5]
+DENSITIES = [5, 10, 15, 20, 30, 40]
+
+SYNTHETIC_TRACE_COUNT = 5
+SYNTHETIC_SAMPLE_RATE = 250  # Hz
+
+# start circle of the MainWindow, bottom left corner with a diameter of 50
+START_RECT = (0, PointingExperimentModel.WINDOW_HEIGHT - 50, 50)
+
+# names of the result columns
+TRIAL_COUNT = "trial_count"
+ERROR_RATE = "error_rate"
+MEAN_SELECTION_TIME = "mean_selection_time_in_ms"
+MEDIAN_SELECTION_TIME = "median_selection_time_in_ms"
+
+
+class Trace:
+
+    def __init__(self, samples, target_rect, click_ns=None):
+        # samples is an (n x 3) array of t_ns, x, y, target_rect is (x, y, diameter) of the target,
+        # click_ns is the time of the click on the target, by default the time of the last sample
+        self.samples = samples
+        self.target_rect = target_rect
+        self.click_ns = click_ns if click_ns is not None else samples[-1][0]
+
+
+class _SimulatedSignal:
+
+    def __init__(self):
+        self.__slots = []
+
+    def connect(self, slot):
+        self.__slots.append(slot)
+
+    def emit(self):
+        for slot in self.__slots:
+            slot()
+
+
+class SimulatedTimer:
+    """Replaces the QTimer of the PointingTechnique, the replay calls fire at the simulated time of every timeout."""
+
+    def __init__(self):
+        self.timeout = _SimulatedSignal()
+        self.now_ns = 0
+        self.next_ns = None
+        self.__interval_ns = 0
+
+    def setInterval(self, interval):
+        self.__interval_ns = interval * 1000000
+
+    def start(self):
+        self.next_ns = self.now_ns + self.__interval_ns
+
+    def stop(self):
+        self.next_ns = None
+
+    def isActive(self):
+        return self.next_ns is not None
+
+    def fire(self):
+        self.now_ns = self.next_ns
+        self.next_ns += self.__interval_ns
+        self.timeout.emit()
+
+
+class _ReplayWindow:
+
+    @staticmethod
+    def width():
+        return PointingExperimentModel.WINDOW_WIDTH
+
+
+class _ReplayTarget:
+    # the parts of a CircleWidget used by the PointingTechnique
+
+    def __init__(self, x, y, diameter):
+        self.__geometry = QtCore.QRect(x, y, diameter, diameter)
+
+    def geometry(self):
+        return self.__geometry
+
+    def width(self):
+        return self.__geometry.width()
+
+    @staticmethod
+    def parent():
+        return _ReplayWindow()
+
+
+class _Cursor:
+    # position of the cursor and the time at which it entered the target for the last time
+
+    def __init__(self, target_rect):
+        x, y, diameter = target_rect
+        self.__center_x = x + diameter / 2
+        self.__center_y = y + diameter / 2
+        self.__radius = diameter / 2
+
+        self.x = 0
+        self.y = 0
+        self.entered_ns = None
+
+    def move_to(self, x, y, t_ns):
+        self.x = x
+        self.y = y
+
+        if math.hypot(x - self.__center_x, y - self.__center_y) > self.__radius:
+            self.entered_ns = None
+        elif self.entered_ns is None:
+            self.entered_ns = t_ns
+
+
+def replay_trace(trace, threshold=None, density=None):
+    """
+    Returns the time in ms at which the cursor entered the target for the last time (NaN if it is not inside of the
+    target at the end) and whether the target is selected. Without threshold the trace is replayed without technique.
+    """
+    samples = trace.samples
+    cursor = _Cursor(trace.target_rect)
+
+    if threshold is None:
+        for t_ns, x, y in samples:
+            cursor.move_to(x, y, t_ns)
+
+        return _get_entry_time(samples, cursor.entered_ns), cursor.entered_ns is not None
+
+    timer = SimulatedTimer()
+    output_device = FakeUInput()
+    technique = PointingTechnique(_ReplayTarget(*trace.target_rect), threshold, density,
+                                  VirtualPointerDevice(lambda capabilities: output_device), timer)
+
+    sample_interval_ns = PointingTechnique.sample_interval * 1000000
+    last_filter_ns = None
+    offset_x = 0
+    offset_y = 0
+    written_event_count = 0
+
+    def apply_movements(hand_x, hand_y, t_ns):
+        # the movements written by the technique since the last call are added to the position of the hand
+        nonlocal offset_x, offset_y, written_event_count
+        for _, code, value in output_device.events[written_event_count:]:
+            if code == REL_X:
+                offset_x += value
+            else:
+                offset_y += value
+        written_event_count = len(output_device.events)
+
+        cursor.move_to(hand_x + offset_x, hand_y + offset_y, t_ns)
+
+    def filter_cursor(t_ns):
+        nonlocal last_filter_ns
+        last_filter_ns = t_ns
+        technique.filter(QtCore.QPoint(cursor.x, cursor.y))
+
+    hand_x, hand_y = samples[0][1], samples[0][2]
+    for t_ns, x, y in samples:
+        # the steps of the technique before the sample, the hand is still at the previous sample
+        while timer.isActive() and timer.next_ns <= t_ns:
+            timer.fire()
+            apply_movements(hand_x, hand_y, timer.now_ns)
+
+        if cursor.entered_ns is not None and (offset_x or offset_y):
+            # the participant stops the hand as soon as the technique has moved the cursor into the target
+            break
+
+        hand_x, hand_y = x, y
+        timer.now_ns = t_ns
+        apply_movements(hand_x, hand_y, t_ns)
+
+        if last_filter_ns is None or t_ns - last_filter_ns >= sample_interval_ns:
+            filter_cursor(t_ns)
+            apply_movements(hand_x, hand_y, t_ns)
+
+    # the hand rests at the end of the trace until the technique has finished its movement
+    while timer.isActive():
+        timer.fire()
+        apply_movements(hand_x, hand_y, timer.now_ns)
+
+        if timer.isActive() and timer.now_ns - last_filter_ns >= sample_interval_ns:
+            filter_cursor(timer.now_ns)
+            apply_movements(hand_x, hand_y, timer.now_ns)
+
+    return _get_entry_time(samples, cursor.entered_ns), cursor.entered_ns is not None
+
+
+def _get_entry_time(samples, entered_ns):
+    if entered_ns is None:
+        return np.nan
+
+    return (entered_ns - samples[0][0]) / 1000000
+
+
+def _get_click_time(trace):
+    return (trace.click_ns - trace.samples[0][0]) / 1000000
+
+
+def replay_traces(traces, threshold=None, density=None):
+    """
+    Returns the error rate and the predicted selection times of the selected targets for one combination of the
+    parameters, without technique if threshold is None.
+    """
+    selection_times = []
+    error_count = 0
+
+    for trace in traces:
+        entry_time, is_selected_without_technique = replay_trace(trace)
+
+        if threshold is None:
+            is_selected = is_selected_without_technique
+            selection_time = _get_click_time(trace)
+        else:
+            # the participant needs the same time from entering the target to the click as without the technique
+            click_delay = _get_click_time(trace) - entry_time if is_selected_without_technique else 0
+            technique_entry_time, is_selected = replay_trace(trace, threshold, density)
+            selection_time = technique_entry_time + click_delay
+
+        if is_selected:
+            selection_times.append(selection_time)
+        else:
+            error_count += 1
+
+    return error_count / len(traces), selection_times
+
+
+_worker_traces = None
+
+
+def _set_worker_traces(traces):
+    # the traces are sent once to every process instead of once per combination
+    global _worker_traces
+    _worker_traces = traces
+
+
+def _replay_combination(combination):
+    return replay_traces(_worker_traces, *combination)
+
+
+def _create_result_row(threshold, density, trace_count, error_rate, selection_times):
+    return {
+        ConfigKeys.THRESHOLD.value: threshold,
+        ConfigKeys.DENSITY.value: density,
+        TRIAL_COUNT: trace_count,
+        ERROR_RATE: error_rate,
+        MEAN_SELECTION_TIME: np.mean(selection_times) if selection_times else np.nan,
+        MEDIAN_SELECTION_TIME: np.median(selection_times) if selection_times else np.nan
+    }
+
+
+def sweep(traces, thresholds=THRESHOLDS, densities=DENSITIES, max_workers=None):
+    combinations = [(threshold, density) for threshold in thresholds for density in densities]
+
+    if max_workers == 1:
+        results = [replay_traces(traces, *combination) for combination in combinations]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_set_worker_traces,
+                                 initargs=(traces,)) as executor:
+            results = list(executor.map(_replay_combination, combinations))
+
+    rows = [_create_result_row(threshold, density, len(traces), error_rate, selection_times)
+            for (threshold, density), (error_rate, selection_times) in zip(combinations, results)]
+
+    # the traces without technique as reference, with NaN as threshold and density
+    rows.insert(0, _create_result_row(np.nan, np.nan, len(traces), *replay_traces(traces)))
+
+    return pd.DataFrame(rows)
+
+
+def get_planned_targets(plan):
+    """Returns the target rect (x, y, diameter) of every trial by (condition id, trial index)."""
+    targets = {}
+
+    for condition, trials in zip(plan[ConfigKeys.CONDITIONS.value], plan[ConfigKeys.SESSION_PLAN.value]):
+        for trial_index, trial in enumerate(trials):
+            x, y = trial[SessionPlanKeys.TARGET_POSITION.value]
+            targets[(condition["id"], trial_index)] = (x, y, condition[ConfigKeys.CIRCLE_SIZE.value])
+
+    return targets
+
+
+def load_recorded_traces(plan, directory):
+    traces = []
+    targets = get_planned_targets(plan)
+
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(TrajectoryRecorder.FILE_EXTENSION):
+            continue
+
+        # <participant_id>_<pointer_type>_<condition>_<trial>.trajectory, the traces of the novel pointer already
+        # contain the movements of the technique
+        _, pointer_type, condition_id, trial_index = os.path.splitext(file_name)[0].split("_")
+        if pointer_type != "normal":
+            continue
+
+        target_rect = targets.get((int(condition_id), int(trial_index)))
+        if target_rect is None:
+            continue
+
+        samples = np.fromfile(os.path.join(directory, file_name), dtype="<i8").reshape(-1, 4)
+
+        # the clicks are not replayed, the last one is the click on the target. Files which were recorded without
+        # click samples end with the last mouse move instead.
+        is_click = (samples[:, 3] & TrajectoryRecorder.CLICK_FLAG) != 0
+        click_ns = int(samples[is_click][-1, 0]) if is_click.any() else None
+        samples = samples[~is_click]
+
+        if len(samples):
+            traces.append(Trace(samples[:, :3].tolist(), target_rect, click_ns))
+
+    return traces
+
+
+def create_synthetic_trace(target_rect, generator, a=200.0, b=150.0, noise=0.1, sample_rate=SYNTHETIC_SAMPLE_RATE):
+    # a and b are the Fitts' law parameters in ms and ms/bit, like in simulated_participant.py
+    start_x, start_y, start_diameter = START_RECT
+    start_x += generator.uniform(0.2, 0.8) * start_diameter
+    start_y += generator.uniform(0.2, 0.8) * start_diameter
+
+    # about 4 % of the end points are outside of the target
+    x, y, diameter = target_rect
+    end_x = generator.gauss(x + diameter / 2, diameter / 4.133)
+    end_y = generator.gauss(y + diameter / 2, diameter / 4.133)
+
+    distance = math.dist([start_x, start_y], [end_x, end_y])
+    movement_time = (a + b * math.log2(distance / diameter + 1)) * math.exp(generator.gauss(0, noise))
+    sample_count = max(int(movement_time * sample_rate / 1000), 1)
+
+    samples = []
+    for i in range(sample_count + 1):
+        t = i / sample_count
+        s = 10 * t ** 3 - 15 * t ** 4 + 6 * t ** 5
+        samples.append((int(t * movement_time * 1000000), round(start_x + s * (end_x - start_x)),
+                        round(start_y + s * (end_y - start_y))))
+
+    return Trace(samples, target_rect)
+
+
+def create_synthetic_traces(plan, trace_count=SYNTHETIC_TRACE_COUNT, seed=0):
+    generator = random.Random(seed)
+
+    return [create_synthetic_trace(target_rect, generator)
+            for target_rect in get_planned_targets(plan).values() for _ in range(trace_count)]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: trace_replay.py <test config or session plan> [trajectory directory] "
+                         "[number of processes]\n")
+        sys.exit(1)
+
+    config = ConfigParsing(sys.argv[1]).get_config()
+
+    if len(sys.argv) > 2 and ConfigKeys.SESSION_PLAN.value not in config:
+        sys.stderr.write("recorded traces can only be replayed with the session plan of their sessions\n")
+        sys.exit(1)
+
+    session_plan = config if ConfigKeys.SESSION_PLAN.value in config else SessionPlan.compile(config)
+    replayed_traces = load_recorded_traces(session_plan, sys.argv[2]) if len(sys.argv) > 2 \
+        else create_synthetic_traces(session_plan)
+
+    if not replayed_traces:
+        sys.stderr.write("no traces found\n")
+        sys.exit(1)
+
+    pd.set_option("display.width", 200)
+    print(sweep(replayed_traces, max_workers=int(sys.argv[3]) if len(sys.argv) > 3 else None).to_string(index=False))
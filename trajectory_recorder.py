@@ -0,0 +1,97 @@
+import os
+import sys
+from array import array
+
+"""
+Records the cursor trajectory of every trial, so the analysis can compute path lengths, overshoots and submovements.
+
+Every mouse move is stored as one sample (t_ns, x, y, buttons) in a ring buffer which is allocated once:
+a flat array of 64 bit integers with four values per sample, so no Python object is created per sample.
+The click on a circle is recorded as an additional sample, whose buttons value also contains CLICK_FLAG.
+If a trial has more samples than the capacity, the oldest samples are overwritten, their number is written to the
+results (see PointingExperimentModel.DROPPED_TRAJECTORY_SAMPLES).
+
+At the end of a trial the samples are written in chronological order to the file
+<directory>/<participant_id>_<pointer_type>_<condition>_<trial>.trajectory as little endian 64 bit integers without
+a header, so a file can be read without copying, e.g. with numpy.memmap(file_name, dtype="<i8").reshape(-1, 4).
+If a collector sink is given (see result_collector.py), the content of every file is also sent to the collector.
+"""
+
+
+class TrajectoryRecorder:
+    FIELD_COUNT = 4  # t_ns, x, y, buttons
+    FILE_EXTENSION = ".trajectory"
+    # added to the buttons of the click samples, above all Qt.MouseButton values
+    CLICK_FLAG = 1 << 32
+
+    @staticmethod
+    def get_file_name(directory, participant_id, pointer_type, condition_id, trial_index):
+        # the pointer type tells the sessions of a participant apart (see study_plan.py)
+        return os.path.join(directory, "{0}_{1}_{2}_{3}{4}".format(
+            participant_id, pointer_type, condition_id, trial_index, TrajectoryRecorder.FILE_EXTENSION))
+
+    def __init__(self, directory, participant_id, pointer_type, capacity=65536, collector_sink=None):
+        self.__directory = directory
+        self.__participant_id = participant_id
+        self.__pointer_type = pointer_type
+        self.__collector_sink = collector_sink
+        self.__capacity = capacity
+
+        self.__samples = array("q", bytes(8 * self.FIELD_COUNT * capacity))
+        self.__sample_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, t_ns, x, y, buttons):
+        i = (self.__sample_count % self.__capacity) * self.FIELD_COUNT
+        samples = self.__samples
+
+        samples[i] = t_ns
+        samples[i + 1] = x
+        samples[i + 2] = y
+        samples[i + 3] = buttons
+
+        self.__sample_count += 1
+
+    def record_click(self, t_ns, x, y, buttons):
+        self.record(t_ns, x, y, buttons | self.CLICK_FLAG)
+
+    def get_sample_count(self):
+        return min(self.__sample_count, self.__capacity)
+
+    def get_dropped_sample_count(self):
+        return max(self.__sample_count - self.__capacity, 0)
+
+    def clear(self):
+        self.__sample_count = 0
+
+    def __get_ordered_parts(self):
+        view = memoryview(self.__samples)
+
+        if self.__sample_count <= self.__capacity:
+            return [view[:self.__sample_count * self.FIELD_COUNT]]
+
+        # the buffer is full, the oldest sample is the one which is overwritten next
+        end = (self.__sample_count % self.__capacity) * self.FIELD_COUNT
+        return [view[end:], view[:end]]
+
+    def flush_trial(self, condition_id, trial_index):
+        file_name = self.get_file_name(self.__directory, self.__participant_id, self.__pointer_type, condition_id,
+                                       trial_index)
+
+        with open(file_name, "wb") as file:
+            for part in self.__get_ordered_parts():
+                if sys.byteorder == "little":
+                    file.write(part)
+                else:
+                    swapped = array("q", part)
+                    swapped.byteswap()
+                    file.write(swapped)
+
+        if self.__collector_sink:
+            with open(file_name, "rb") as file:
+                self.__collector_sink.write_trajectory(os.path.basename(file_name), file.read())
+
+        self.clear()
+
+        return file_name
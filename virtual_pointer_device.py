@@ -0,0 +1,102 @@
+"""
+Virtual mouse used by the novel pointing technique to move the cursor (see pointing_technique.py).
+
+Creating a UInput device needs several system calls and udev work, therefore one VirtualPointerDevice is opened
+once per session and shared by the pointing techniques of all trials instead of creating a new device per trial.
+Relative movements are collected with move and written together with a single syn() by flush, which is called
+once per animation frame. The device is closed explicitly with close (or by leaving a with block) and not when
+it is garbage collected.
+
+A different device can be passed as device_factory, e.g. FakeUInput, which only records the written events,
+so the pointing technique can be used without root privileges.
+evdev is only imported when the default UInput device is opened, so the module can be used without evdev.
+The event codes are the ones of linux/input-event-codes.h, which are also used by evdev.ecodes.
+"""
+
+EV_KEY = 0x01
+EV_REL = 0x02
+REL_X = 0x00
+REL_Y = 0x01
+BTN_LEFT = 0x110
+BTN_RIGHT = 0x111
+
+
+def create_uinput_device(capabilities):
+    from evdev import UInput
+
+    return UInput(capabilities)
+
+
+class FakeUInput:
+
+    def __init__(self, capabilities=None):
+        self.capabilities = capabilities
+        self.events = []
+        self.syn_count = 0
+        self.closed = False
+
+    def write(self, event_type, code, value):
+        self.events.append((event_type, code, value))
+
+    def syn(self):
+        self.syn_count += 1
+
+    def close(self):
+        self.closed = True
+
+
+class VirtualPointerDevice:
+    capabilities = {
+        EV_REL: (REL_X, REL_Y),
+        EV_KEY: (BTN_LEFT, BTN_RIGHT)
+    }
+
+    def __init__(self, device_factory=create_uinput_device):
+        self.__device_factory = device_factory
+        self.__device = None
+        self.__rel_x = 0
+        self.__rel_y = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        if self.__device is None:
+            self.__device = self.__device_factory(self.capabilities)
+
+    def is_open(self):
+        return self.__device is not None
+
+    def move(self, rel_x, rel_y):
+        self.__rel_x += rel_x
+        self.__rel_y += rel_y
+
+    def flush(self):
+        if self.__rel_x == 0 and self.__rel_y == 0:
+            return
+
+        self.open()
+
+        if self.__rel_x != 0:
+            self.__device.write(EV_REL, REL_X, self.__rel_x)
+        if self.__rel_y != 0:
+            self.__device.write(EV_REL, REL_Y, self.__rel_y)
+        self.__device.syn()
+
+        self.__rel_x = 0
+        self.__rel_y = 0
+
+    def discard(self):
+        self.__rel_x = 0
+        self.__rel_y = 0
+
+    def close(self):
+        self.discard()
+
+        if self.__device is not None:
+            self.__device.close()
+            self.__device = None